@@ -0,0 +1,97 @@
+"""Measure /messages page latency on a large generated history table.
+
+Builds a messages table with --rows rows spread over --users users, then
+times fetching one page at several depths with OFFSET and with keyset
+cursors, both without and with the (user_id, timestamp, id) index.
+
+    python benchmarks/bench_history.py --rows 2000000
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import (  # noqa: E402
+    MIGRATIONS,
+    SELECT_MESSAGES_AFTER_CURSOR_SQL,
+    SELECT_MESSAGES_SQL,
+)
+
+
+def populate(conn: sqlite3.Connection, rows: int, users: int):
+    conn.execute(MIGRATIONS[0])
+    start = datetime(2025, 1, 1)
+    rng = random.Random(42)
+
+    def generate():
+        for i in range(rows):
+            timestamp = start + timedelta(seconds=i * 3)
+            yield (rng.randrange(users), f"question {i}", "answer " * 20,
+                   timestamp.strftime("%Y-%m-%d %H:%M:%S"))
+
+    conn.executemany("""
+        INSERT INTO messages (user_id, user_message, ai_response, timestamp)
+        VALUES (?, ?, ?, ?)
+    """, generate())
+    conn.commit()
+
+
+def time_query(conn: sqlite3.Connection, sql: str, params, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        conn.execute(sql, params).fetchall()
+    return (time.perf_counter() - start) * 1000 / repeat
+
+
+def bench(conn: sqlite3.Connection, user_id: int, page: int, depths, repeat: int):
+    results = []
+    for depth in depths:
+        offset = depth * page
+        anchor = conn.execute(SELECT_MESSAGES_SQL, (user_id, 1, max(offset - 1, 0))).fetchone()
+        if anchor is None:
+            continue
+        offset_ms = time_query(conn, SELECT_MESSAGES_SQL, (user_id, page, offset), repeat)
+        keyset_ms = time_query(conn, SELECT_MESSAGES_AFTER_CURSOR_SQL,
+                               (user_id, anchor[4], anchor[0], page), repeat)
+        results.append((depth, offset_ms, keyset_ms))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=2_000_000)
+    parser.add_argument("--users", type=int, default=500)
+    parser.add_argument("--page", type=int, default=50)
+    parser.add_argument("--depths", default="0,10,40,80")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    depths = [int(d) for d in args.depths.split(",")]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        conn = sqlite3.connect(os.path.join(tmp, "history.db"))
+        start = time.perf_counter()
+        populate(conn, args.rows, args.users)
+        print(f"generated {args.rows} rows in {time.perf_counter() - start:.1f}s")
+        user_id = conn.execute("""
+            SELECT user_id FROM messages GROUP BY user_id
+            ORDER BY COUNT(*) DESC LIMIT 1
+        """).fetchone()[0]
+
+        for label in ("no index", "indexed"):
+            if label == "indexed":
+                conn.execute(MIGRATIONS[1])
+            print(f"\n{label}: page={args.page}")
+            print(f"{'depth':>6} {'offset ms':>10} {'keyset ms':>10}")
+            for depth, offset_ms, keyset_ms in bench(conn, user_id, args.page, depths, args.repeat):
+                print(f"{depth:>6} {offset_ms:>10.2f} {keyset_ms:>10.2f}")
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,136 @@
+"""Compare chat persistence: legacy, pooled WAL engine, write-behind queue.
+
+Runs concurrent inserts and history reads against a fresh database and
+reports insert throughput and read latency percentiles for each.
+
+    python benchmarks/bench_storage.py --inserts 2000 --readers 8
+"""
+import argparse
+import asyncio
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from database import DatabaseManager  # noqa: E402
+
+
+class LegacyDatabaseManager:
+    """The original connection-per-call implementation, kept for comparison."""
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS messages (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id INTEGER NOT NULL,
+                    user_message TEXT NOT NULL,
+                    ai_response TEXT NOT NULL,
+                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+                )
+            """)
+            conn.commit()
+
+    async def save_message(self, user_id: int, user_message: str, ai_response: str):
+        def _save():
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("""
+                    INSERT INTO messages (user_id, user_message, ai_response)
+                    VALUES (?, ?, ?)
+                """, (user_id, user_message, ai_response))
+                conn.commit()
+
+        await asyncio.to_thread(_save)
+
+    async def get_messages(self, user_id: int, limit: int = 50, offset: int = 0):
+        def _get():
+            with sqlite3.connect(self.db_path) as conn:
+                conn.row_factory = sqlite3.Row
+                cursor = conn.execute("""
+                    SELECT * FROM messages
+                    WHERE user_id = ?
+                    ORDER BY timestamp DESC
+                    LIMIT ? OFFSET ?
+                """, (user_id, limit, offset))
+                return [dict(row) for row in cursor.fetchall()]
+
+        return await asyncio.to_thread(_get)
+
+    async def flush(self):
+        pass
+
+    async def close(self):
+        pass
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+async def run(manager, inserts: int, writers: int, readers: int, users: int):
+    done = asyncio.Event()
+    read_latencies = []
+
+    async def writer(worker: int):
+        for i in range(worker, inserts, writers):
+            await manager.save_message(i % users, f"question {i}", "answer " * 40)
+
+    async def reader(worker: int):
+        i = worker
+        while not done.is_set():
+            start = time.perf_counter()
+            await manager.get_messages(i % users, limit=50)
+            read_latencies.append((time.perf_counter() - start) * 1000)
+            i += 1
+
+    reader_tasks = [asyncio.create_task(reader(r)) for r in range(readers)]
+    start = time.perf_counter()
+    await asyncio.gather(*(writer(w) for w in range(writers)))
+    await manager.flush()
+    elapsed = time.perf_counter() - start
+    done.set()
+    await asyncio.gather(*reader_tasks)
+    return {
+        "inserts_per_sec": inserts / elapsed,
+        "reads": len(read_latencies),
+        "read_p50_ms": percentile(read_latencies, 50),
+        "read_p99_ms": percentile(read_latencies, 99),
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--inserts", type=int, default=2000)
+    parser.add_argument("--writers", type=int, default=16)
+    parser.add_argument("--readers", type=int, default=8)
+    parser.add_argument("--users", type=int, default=50)
+    args = parser.parse_args()
+
+    for label in ("legacy", "engine", "write-behind"):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bench.db")
+            if label == "legacy":
+                manager = LegacyDatabaseManager(path)
+            else:
+                manager = DatabaseManager(path)
+                if label == "write-behind":
+                    await manager.start()
+            try:
+                result = await run(manager, args.inserts, args.writers,
+                                   args.readers, args.users)
+            finally:
+                await manager.close()
+        print(f"{label:>12}: {result['inserts_per_sec']:9.0f} inserts/s  "
+              f"{result['reads']:6d} reads  p50 {result['read_p50_ms']:7.2f} ms  "
+              f"p99 {result['read_p99_ms']:7.2f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
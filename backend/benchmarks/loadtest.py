@@ -0,0 +1,380 @@
+"""Offline load test of the FastAPI app with a fake model and geocoder.
+
+Serves `main.app` with uvicorn on a local port, replaces the Azure OpenAI
+transport with `FakeOpenAITransport` and the Nominatim fallback with a
+fixed-latency stand-in, then drives each endpoint on its own and a weighted
+mix of all of them at the given concurrency. Reports requests/s, latency
+percentiles, time to first byte for streamed endpoints and process RSS per
+phase, and writes everything to a JSON file that a later run can be compared
+against.
+
+    python benchmarks/loadtest.py --requests 500 --concurrency 32
+    python benchmarks/loadtest.py --compare loadtest-before.json
+"""
+import argparse
+import asyncio
+import io
+import json
+import os
+import random
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+import httpx  # noqa: E402
+
+# Marrakech: the medina plus enough of the new town that some points fall
+# outside the offline place index and reach the geocoder fallback.
+LAT_RANGE = (31.600, 31.660)
+LNG_RANGE = (-8.030, -7.970)
+# Enough distinct questions that /chat mostly reaches the model rather than
+# the semantic cache; the hits it does get are reported per phase.
+SUBJECTS = [
+    "the Koutoubia mosque", "the Bahia palace", "the Saadian tombs",
+    "Jemaa el-Fnaa", "the Ben Youssef madrasa", "the Majorelle garden",
+    "the Mellah", "the Menara gardens", "the El Badi palace",
+    "the tanneries", "Bab Agnaou", "the Dar Si Said museum",
+]
+QUESTION_FORMS = [
+    "What is the history of {}?",
+    "When was {} built?",
+    "What should I look for at {}?",
+    "How long does a visit to {} take?",
+    "Is {} worth visiting in the evening?",
+    "What is the architecture of {} like?",
+    "Who lived at {}?",
+    "Where can I eat near {}?",
+]
+QUESTIONS = [form.format(subject) for form in QUESTION_FORMS for subject in SUBJECTS]
+ENDPOINTS = ("chat", "chat_stream", "suggest", "image", "messages")
+DEFAULT_MIX = "chat=3,chat_stream=3,suggest=2,image=1,messages=1"
+
+
+class FakeNominatim:
+    """Stands in for NominatimGeocoder: a fixed delay, then a synthetic address."""
+
+    def __init__(self, latency: float):
+        self.latency = latency
+        self.calls = 0
+        self.busy = 0
+
+    async def reverse(self, lat: float, lon: float):
+        self.calls += 1
+        await asyncio.sleep(self.latency)
+        return f"Derb {abs(int(lat * 1e4)) % 997}, Marrakech, Morocco"
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 2**20
+
+
+def peak_rss_mb() -> float:
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR,
+            stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def make_images(count: int, size: int = 1600):
+    """Distinct camera-sized JPEGs: gradients with a little sensor noise.
+    Each is re-encoded at a lower quality until it fits the upload limit,
+    so /analyze-image measures analysis rather than 413s."""
+    from PIL import Image
+
+    from image_ingest import MAX_UPLOAD_BYTES
+
+    rng = random.Random(7)
+    height = size * 3 // 4
+    images = []
+    for _ in range(count):
+        channels = [
+            Image.blend(
+                Image.linear_gradient("L").rotate(rng.uniform(0, 360)).resize((size, height)),
+                Image.effect_noise((size, height), 64), rng.uniform(0.02, 0.08))
+            for _ in range(3)
+        ]
+        image = Image.merge("RGB", channels)
+        for quality in (85, 75, 65, 55):
+            buffer = io.BytesIO()
+            image.save(buffer, format="JPEG", quality=quality)
+            if buffer.tell() <= MAX_UPLOAD_BYTES:
+                break
+        else:
+            raise SystemExit(f"Test image does not fit in {MAX_UPLOAD_BYTES} bytes")
+        images.append(buffer.getvalue())
+    return images
+
+
+def parse_mix(text: str):
+    weights = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        if name not in ENDPOINTS:
+            raise SystemExit(f"Unknown endpoint in --mix: {name}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+class Workload:
+    def __init__(self, client: httpx.AsyncClient, args, images):
+        self.client = client
+        self.args = args
+        self.images = images
+        self.rng = random.Random(args.seed)
+        self.locations = [
+            f"{self.rng.uniform(*LAT_RANGE):.6f},{self.rng.uniform(*LNG_RANGE):.6f}"
+            for _ in range(args.locations)
+        ]
+
+    def _params(self):
+        return {"user_id": self.rng.randint(1, self.args.users),
+                "location": self.rng.choice(self.locations)}
+
+    async def request(self, endpoint: str):
+        """Issue one request; returns (status, latency_s, ttfb_s or None)."""
+        start = time.perf_counter()
+        if endpoint in ("chat", "chat_stream"):
+            path = "/chat" if endpoint == "chat" else "/chat/stream"
+            body = {"message": self.rng.choice(QUESTIONS)}
+            if endpoint == "chat":
+                response = await self.client.post(path, params=self._params(), json=body)
+                return response.status_code, time.perf_counter() - start, None
+            ttfb = None
+            async with self.client.stream("POST", path, params=self._params(),
+                                          json=body) as response:
+                async for _ in response.aiter_raw():
+                    if ttfb is None:
+                        ttfb = time.perf_counter() - start
+            return response.status_code, time.perf_counter() - start, ttfb
+        if endpoint == "suggest":
+            response = await self.client.get("/suggest-locations", params=self._params())
+        elif endpoint == "image":
+            files = {"file": ("frame.jpg", self.rng.choice(self.images), "image/jpeg")}
+            response = await self.client.post(
+                "/analyze-image", params={"user_id": self.rng.randint(1, self.args.users)},
+                files=files)
+        else:
+            response = await self.client.get(
+                "/messages", params={"user_id": self.rng.randint(1, self.args.users),
+                                     "limit": 50})
+        return response.status_code, time.perf_counter() - start, None
+
+
+async def run_phase(workload: Workload, weights, requests: int, concurrency: int,
+                    cache_stats):
+    names = list(weights)
+    choices = workload.rng.choices(names, [weights[n] for n in names], k=requests)
+    samples = {name: {"latency": [], "ttfb": [], "errors": 0} for name in names}
+    queue = iter(choices)
+
+    async def worker():
+        for endpoint in queue:
+            try:
+                status, latency, ttfb = await workload.request(endpoint)
+            except httpx.HTTPError:
+                samples[endpoint]["errors"] += 1
+                continue
+            if status >= 400:
+                samples[endpoint]["errors"] += 1
+            samples[endpoint]["latency"].append(latency)
+            if ttfb is not None:
+                samples[endpoint]["ttfb"].append(ttfb)
+
+    rss_start = rss_mb()
+    hits_start = cache_stats()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    hits_end = cache_stats()
+
+    endpoints = {}
+    for name, data in samples.items():
+        latency = data["latency"]
+        result = {
+            "requests": len(latency),
+            "errors": data["errors"],
+            "rps": round(len(latency) / elapsed, 1),
+            "p50_ms": round(percentile(latency, 50) * 1000, 2),
+            "p90_ms": round(percentile(latency, 90) * 1000, 2),
+            "p99_ms": round(percentile(latency, 99) * 1000, 2),
+            "max_ms": round(max(latency, default=0) * 1000, 2),
+        }
+        if data["ttfb"]:
+            result["ttft_p50_ms"] = round(percentile(data["ttfb"], 50) * 1000, 2)
+            result["ttft_p99_ms"] = round(percentile(data["ttfb"], 99) * 1000, 2)
+        endpoints[name] = result
+    return {
+        "elapsed_s": round(elapsed, 3),
+        "rps": round(requests / elapsed, 1),
+        "rss_start_mb": round(rss_start, 1),
+        "rss_end_mb": round(rss_mb(), 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        "cache_hits": {name: hits_end[name] - hits_start[name] for name in hits_end},
+        "endpoints": endpoints,
+    }
+
+
+def print_phase(name: str, phase):
+    print(f"\n== {name}: {phase['rps']:.0f} req/s over {phase['elapsed_s']:.1f}s, "
+          f"RSS {phase['rss_start_mb']:.0f} -> {phase['rss_end_mb']:.0f} MB "
+          f"(peak {phase['peak_rss_mb']:.0f} MB)")
+    print("   cache hits: " + ", ".join(
+        f"{name} {hits}" for name, hits in phase["cache_hits"].items()))
+    for endpoint, r in phase["endpoints"].items():
+        ttft = f"  ttft p50 {r['ttft_p50_ms']:7.1f}" if "ttft_p50_ms" in r else ""
+        print(f"{endpoint:>12}: {r['requests']:6d} req  {r['errors']:4d} err  "
+              f"{r['rps']:8.1f}/s  p50 {r['p50_ms']:7.1f}  p90 {r['p90_ms']:7.1f}  "
+              f"p99 {r['p99_ms']:7.1f} ms{ttft}")
+
+
+def print_comparison(baseline, current):
+    print(f"\n== compared with {baseline.get('commit', '?')} (p50 / rps change)")
+    for name, phase in current["phases"].items():
+        old_phase = baseline.get("phases", {}).get(name)
+        if old_phase is None:
+            continue
+        for endpoint, r in phase["endpoints"].items():
+            old = old_phase["endpoints"].get(endpoint)
+            if not old or not old["p50_ms"] or not old["rps"]:
+                continue
+            print(f"{name:>12} {endpoint:>12}: p50 {r['p50_ms'] / old['p50_ms'] - 1:+7.1%}  "
+                  f"rps {r['rps'] / old['rps'] - 1:+7.1%}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=500,
+                        help="requests per phase")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--mix", default=DEFAULT_MIX,
+                        help="endpoint weights for the mixed phase")
+    parser.add_argument("--phases", default="isolated,mixed",
+                        help="isolated (each endpoint alone) and/or mixed")
+    parser.add_argument("--users", type=int, default=50)
+    parser.add_argument("--locations", type=int, default=200,
+                        help="distinct coordinates to draw from")
+    parser.add_argument("--images", type=int, default=20,
+                        help="distinct JPEG uploads to draw from")
+    parser.add_argument("--model-latency", type=float, default=0.3,
+                        help="fake model time to first byte, seconds")
+    parser.add_argument("--token-latency", type=float, default=0.02,
+                        help="fake model delay between streamed chunks, seconds")
+    parser.add_argument("--geocoder-latency", type=float, default=0.2,
+                        help="fake Nominatim latency, seconds")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", default="loadtest-results.json")
+    parser.add_argument("--compare", help="earlier results file to diff against")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    # Every database and cache file the app opens goes into a scratch dir.
+    workdir = tempfile.TemporaryDirectory()
+    os.chdir(workdir.name)
+    os.environ.setdefault("OPENAI_FAKE_TRANSPORT", "1")
+    os.environ.setdefault("GEOCODER_NOMINATIM", "0")
+    os.environ.setdefault("LOG_LEVEL", "WARNING")
+    import uvicorn
+    import main as app_module
+    from client import OpenAIClient
+    from fake_transport import FakeOpenAITransport
+    from geocoder import OfflineGeocoder, ReverseGeocoder
+
+    transport = FakeOpenAITransport(latency=args.model_latency,
+                                    token_latency=args.token_latency)
+    await app_module.openai_client.aclose()
+    app_module.openai_client = OpenAIClient(transport=transport)
+    nominatim = FakeNominatim(args.geocoder_latency)
+    app_module.geocoder = ReverseGeocoder(offline=OfflineGeocoder(), fallback=nominatim)
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(
+        app_module.app, host="127.0.0.1", port=port, log_level="warning"))
+    serve_task = asyncio.create_task(server.serve())
+    while not server.started:
+        await asyncio.sleep(0.05)
+
+    def cache_stats():
+        suggestions = app_module.suggestion_cache.stats()
+        return {"chat": app_module.chat_cache.hits,
+                "suggestions": suggestions["hits"] + suggestions["shared_hits"],
+                "images": app_module.image_cache.exact_hits + app_module.image_cache.near_hits}
+
+    images = make_images(args.images)
+    results = {
+        "commit": git_commit(),
+        "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": {key: value for key, value in vars(args).items()
+                   if key not in ("output", "compare")},
+        "phases": {},
+    }
+    limits = httpx.Limits(max_connections=args.concurrency,
+                          max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}",
+                                 limits=limits, timeout=120) as client:
+        workload = Workload(client, args, images)
+        phases = args.phases.split(",")
+        if "isolated" in phases:
+            for endpoint in ENDPOINTS:
+                results["phases"][endpoint] = await run_phase(
+                    workload, {endpoint: 1}, args.requests, args.concurrency,
+                    cache_stats)
+                print_phase(endpoint, results["phases"][endpoint])
+        if "mixed" in phases:
+            results["phases"]["mixed"] = await run_phase(
+                workload, parse_mix(args.mix), args.requests, args.concurrency,
+                cache_stats)
+            print_phase("mixed", results["phases"]["mixed"])
+        results["server"] = (await client.get("/metrics", params={"format": "json"})).json()
+
+    results["upstream"] = {
+        "model_requests": transport.requests,
+        "model_max_in_flight": transport.max_in_flight,
+        "geocoder_requests": nominatim.calls,
+    }
+    server.should_exit = True
+    await serve_task
+    os.chdir(BACKEND_DIR)
+    workdir.cleanup()
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nmodel requests {transport.requests} (max in flight "
+          f"{transport.max_in_flight}), geocoder requests {nominatim.calls}")
+    print(f"wrote {output}")
+    if baseline is not None:
+        print_comparison(baseline, results)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
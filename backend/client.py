@@ -1,157 +1,468 @@
 # client.py
-from openai import AzureOpenAI
+from openai import (
+    AsyncAzureOpenAI,
+    APIConnectionError,
+    APIStatusError,
+)
 import os
 from dotenv import load_dotenv
 import asyncio
+import copy
+import functools
 import json
+import random
+import time
+import httpx
+from metrics import (
+    MODEL_CALLS,
+    MODEL_COMPLETION_TOKENS,
+    MODEL_PAYLOAD,
+    MODEL_RETRIES,
+    MODEL_STREAM_CHUNKS,
+    MODEL_TOKENS,
+    MODEL_TRUNCATED,
+    STAGE_LATENCY,
+    logger,
+    span,
+)
+from profiles import PROFILES, Profile
+from shared_state import LocalStore, RateLimiter
+from singleflight import SingleFlight, coalesce
 
 load_dotenv()
 
+STANDARD = PROFILES["standard"]
+
 AI_GUIDE_SYSTEM_PROMPT = """
 You are a Guide in Morocco, you are given a location and you need to provide the user with the top 5 tourist attractions near the given location with detailed metadata.
 if the user asks for a specific location, you need to provide the user with the top 5 tourist attractions near the given location with detailed metadata.
 """
 
+VISION_SYSTEM_PROMPT = (
+    "You are a helpful assistant that analyzes images and "
+    "provides detailed descriptions about tourist attractions, "
+    "landmarks, and cultural sites in Morocco. Focus on "
+    "historical significance, architectural details, and "
+    "cultural importance."
+)
+
+IMAGE_ANALYSIS_PROMPT = (
+    "Please analyze this image and provide detailed "
+    "information about what you see, focusing on its "
+    "historical and cultural significance if it's a "
+    "tourist attraction or landmark."
+)
+
+# Short variants for the fast profile: answers are meant to be listened to.
+AI_GUIDE_COMPACT_PROMPT = (
+    "You are a tour guide in Morocco. Answer in two or three short spoken "
+    "sentences about the user's location."
+)
+VISION_COMPACT_PROMPT = (
+    "You identify landmarks and cultural sites in Morocco from photos."
+)
+IMAGE_ANALYSIS_COMPACT_PROMPT = (
+    "In two or three short sentences, say what this is and why it matters."
+)
+
+
+SUGGEST_TOOLS = [
+    {
+        "type": "function",
+        "function": {
+            "name": "get_top_tourist_spots",
+            "description": "Returns the top 5 tourist attractions near the given location with detailed metadata.",
+            "parameters": {
+                "type": "object",
+                "properties": {
+                    "spots": {
+                        "type": "array",
+                        "description": "List of top tourist attractions.",
+                        "items": {
+                            "type": "object",
+                            "properties": {
+                                "name": {
+                                    "type": "string",
+                                    "description": "The name of the tourist attraction in local and English."
+                                },
+                                "nameAr": {
+                                    "type": "string",
+                                    "description": "The Arabic name of the tourist attraction."
+                                },
+                                "distance": {
+                                    "type": "string",
+                                    "description": "Distance from user's location (e.g., '150m', '2.5km')."
+                                },
+                                "walkingTime": {
+                                    "type": "string",
+                                    "description": "Estimated walking time (e.g., '2 min', '15 min')."
+                                },
+                                "direction": {
+                                    "type": "string",
+                                    "description": "Direction from user's location (e.g., 'Northeast', 'South')."
+                                },
+                                "period": {
+                                    "type": "string",
+                                    "description": "Historical period or construction date."
+                                },
+                                "description": {
+                                    "type": "string",
+                                    "description": "Brief description of the tourist attraction."
+                                },
+                                "rating": {
+                                    "type": "number",
+                                    "description": "Rating out of 5.0."
+                                },
+                                "visitors": {
+                                    "type": "string",
+                                    "description": "Current visitor count (e.g., '2.3k today')."
+                                },
+                                "coordinates": {
+                                    "type": "object",
+                                    "properties": {
+                                        "lat": {"type": "number"},
+                                        "lng": {"type": "number"}
+                                    },
+                                    "required": ["lat", "lng"]
+                                },
+                                "googleMapsUrl": {
+                                    "type": "string",
+                                    "description": "Google Maps URL for the location."
+                                },
+                                "visitDuration": {
+                                    "type": "string",
+                                    "description": "Recommended visit duration (e.g., '15-20 min')."
+                                },
+                                "highlights": {
+                                    "type": "array",
+                                    "items": {"type": "string"},
+                                    "description": "Key highlights or features."
+                                },
+                                "tips": {
+                                    "type": "string",
+                                    "description": "Visitor tips or recommendations."
+                                }
+                            },
+                            "required": ["name", "nameAr", "distance", "walkingTime", "direction", "description", "rating", "coordinates", "googleMapsUrl", "visitDuration", "highlights"]
+                        }
+                    }
+                },
+                "required": ["spots"]
+            }
+        }
+    }
+]
+
+SPOT_SCHEMA = SUGGEST_TOOLS[0]["function"]["parameters"]["properties"]["spots"]["items"]
+
+
+def _estimate_tokens(kwargs: dict) -> int:
+    """Tokens the request may use, counted the way Azure's quota does:
+    prompt (text at ~4 characters per token, images by detail level) plus
+    the completion limit."""
+    chars = 0
+    images = 0
+    for message in kwargs["messages"]:
+        content = message.get("content") or ""
+        if isinstance(content, str):
+            chars += len(content)
+            continue
+        for part in content:
+            if part.get("type") == "image_url":
+                images += 85 if part["image_url"].get("detail") == "low" else 765
+            else:
+                chars += len(part.get("text", ""))
+    if "tools" in kwargs:
+        chars += len(json.dumps(kwargs["tools"]))
+    completion = kwargs.get("max_completion_tokens") or kwargs.get("max_tokens") or 1000
+    return chars // 4 + images + completion
+
+
+def _payload_bytes(value) -> int:
+    """Approximate request size: total length of the strings in it."""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, dict):
+        return sum(_payload_bytes(v) for v in value.values())
+    if isinstance(value, (list, tuple)):
+        return sum(_payload_bytes(v) for v in value)
+    return 0
+
+
+SUGGEST_TOOL_CHOICE = {"type": "function", "function": {
+    "name": "get_top_tourist_spots"}}
+
+
+def guide_messages(message: str, location: str, profile: Profile,
+                   history: list = None):
+    system = AI_GUIDE_COMPACT_PROMPT if profile.compact_prompts else AI_GUIDE_SYSTEM_PROMPT
+    return [
+        {"role": "system", "content": system},
+        *(history or ()),
+        {"role": "user", "content": message + f"for the location: {location}"}
+    ]
+
+
+def vision_system_prompt(profile: Profile) -> str:
+    return VISION_COMPACT_PROMPT if profile.compact_prompts else VISION_SYSTEM_PROMPT
+
+
+def image_prompt(profile: Profile) -> str:
+    return IMAGE_ANALYSIS_COMPACT_PROMPT if profile.compact_prompts else IMAGE_ANALYSIS_PROMPT
+
+
+def image_part(base64_image: str, profile: Profile) -> dict:
+    image_url = {"url": f"data:image/jpeg;base64,{base64_image}"}
+    if profile.image_detail:
+        image_url["detail"] = profile.image_detail
+    return {"type": "image_url", "image_url": image_url}
+
+
+@functools.lru_cache(maxsize=None)
+def suggest_tools(profile: Profile) -> list:
+    """SUGGEST_TOOLS with the spot schema cut down to `profile.spot_fields`.
+
+    Position-relative fields are left out of reduced schemas: ranking
+    recomputes them from the coordinates anyway."""
+    if profile.spot_fields is None:
+        return SUGGEST_TOOLS
+    tools = copy.deepcopy(SUGGEST_TOOLS)
+    items = tools[0]["function"]["parameters"]["properties"]["spots"]["items"]
+    items["properties"] = {name: schema for name, schema in items["properties"].items()
+                           if name in profile.spot_fields}
+    items["required"] = [name for name in items["required"]
+                         if name in profile.spot_fields]
+    return tools
+
+
+def spot_schema(profile: Profile) -> dict:
+    return suggest_tools(profile)[0]["function"]["parameters"]["properties"]["spots"]["items"]
+
+
+def suggest_messages(location: str, profile: Profile = STANDARD):
+    if profile.compact_prompts:
+        return [
+            {"role": "system", "content": "Always return exactly 5 spots."},
+            {"role": "user", "content": f"Top 5 tourist attractions near {location}."}
+        ]
+    return [
+        {
+            "role": "system",
+            "content": "You must provide exactly 5 tourist spots with complete details for each location requested. Always populate the spots array with 5 entries."
+        },
+        {
+            "role": "user",
+            "content": f"Find and list exactly 5 top tourist attractions near {location}. Include title, details, exact location, distance, walking time, entry fee, and opening hours for each spot."
+        }
+    ]
+
 
 class OpenAIClient:
-    def __init__(self):
-        self.client = AzureOpenAI(
-            api_version="2024-02-15-preview",
+    def __init__(self, transport: httpx.AsyncBaseTransport = None, store=None):
+        if transport is None and os.getenv("OPENAI_FAKE_TRANSPORT") == "1":
+            from fake_transport import FakeOpenAITransport
+            transport = FakeOpenAITransport()
+        # A placeholder key is only acceptable when requests never reach
+        # Azure; otherwise refuse to start rather than fail on every call.
+        api_key = os.getenv("AZURE_OPENAI_KEY")
+        if not api_key:
+            if transport is None:
+                raise RuntimeError("AZURE_OPENAI_KEY is not set")
+            api_key = "offline"
+
+        max_connections = int(os.getenv("OPENAI_MAX_CONNECTIONS", "100"))
+        self.http_client = httpx.AsyncClient(
+            transport=transport,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_connections),
+            timeout=httpx.Timeout(
+                float(os.getenv("OPENAI_TIMEOUT", "60")), connect=5.0)
+        )
+        self.client = AsyncAzureOpenAI(
+            # 2024-10-21 is the first GA version with max_completion_tokens
+            # and stream_options, which both calls below rely on.
+            api_version=os.getenv("AZURE_OPENAI_API_VERSION", "2024-10-21"),
             azure_endpoint="https://highleads-01.openai.azure.com/",
-            api_key=os.getenv("AZURE_OPENAI_KEY")
+            api_key=api_key,
+            http_client=self.http_client,
+            max_retries=0
         )
+        self.chat_model = "gpt-4.1"
         self.vision_model = "gpt-4.1"
+        self.max_concurrency = int(os.getenv("OPENAI_MAX_CONCURRENCY", "32"))
+        self.max_retries = int(os.getenv("OPENAI_MAX_RETRIES", "3"))
+        self.backoff_base = float(os.getenv("OPENAI_BACKOFF_BASE", "0.5"))
+        self.backoff_max = float(os.getenv("OPENAI_BACKOFF_MAX", "8"))
+        self._semaphores = {}
+        self.single_flight = SingleFlight()
+        # Deployment quota, shared by every worker through `store`.
+        store = store or LocalStore()
+        self.request_limiter = RateLimiter(
+            store, "azure:requests", float(os.getenv("AZURE_OPENAI_RPM", "0")))
+        self.token_limiter = RateLimiter(
+            store, "azure:tokens", float(os.getenv("AZURE_OPENAI_TPM", "0")))
 
-    async def chat_completion(self, message: str, location: str):
-        response = self.client.chat.completions.create(
-            messages=[
-                {"role": "system", "content": AI_GUIDE_SYSTEM_PROMPT},
-                {"role": "user", "content": message +
-                    f"for the location: {location}"}
-            ],
-            model="gpt-4.1",
-            max_completion_tokens=800,
+    def _semaphore(self, model: str) -> asyncio.Semaphore:
+        if model not in self._semaphores:
+            self._semaphores[model] = asyncio.Semaphore(self.max_concurrency)
+        return self._semaphores[model]
+
+    def _should_retry(self, error: Exception) -> bool:
+        if isinstance(error, APIStatusError):
+            return error.status_code == 429 or error.status_code >= 500
+        return isinstance(error, APIConnectionError)
+
+    def _backoff(self, attempt: int, error: Exception) -> float:
+        delay = random.uniform(
+            0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+        if isinstance(error, APIStatusError):
+            retry_after = error.response.headers.get("retry-after")
+            try:
+                delay = max(delay, float(retry_after))
+            except (TypeError, ValueError):
+                pass
+        return delay
+
+    async def _request(self, operation: str, **kwargs):
+        """Send a completion request, retrying transient errors.
+
+        Each attempt waits for quota before taking a slot of the model's
+        semaphore, so callers held back by the rate limit never occupy a
+        slot. On success the slot is still held and the caller releases it.
+        """
+        semaphore = self._semaphore(kwargs["model"])
+        attempt = 0
+        tokens = _estimate_tokens(kwargs)
+        while True:
+            await self.request_limiter.acquire()
+            await self.token_limiter.acquire(tokens)
+            await semaphore.acquire()
+            try:
+                return await self.client.chat.completions.create(**kwargs)
+            except BaseException as e:
+                semaphore.release()
+                if not isinstance(e, Exception):
+                    raise
+                if attempt >= self.max_retries or not self._should_retry(e):
+                    MODEL_CALLS.inc(operation=operation, outcome="error")
+                    raise
+                MODEL_RETRIES.inc(operation=operation)
+                await asyncio.sleep(self._backoff(attempt, e))
+                attempt += 1
+
+    def _record_usage(self, operation: str, profile: Profile, usage,
+                      finish_reason: str):
+        if usage is not None:
+            MODEL_TOKENS.inc(usage.prompt_tokens, operation=operation,
+                             profile=profile.name, kind="prompt")
+            MODEL_TOKENS.inc(usage.completion_tokens, operation=operation,
+                             profile=profile.name, kind="completion")
+            MODEL_COMPLETION_TOKENS.observe(usage.completion_tokens,
+                                            operation=operation, profile=profile.name)
+        if finish_reason == "length":
+            MODEL_TRUNCATED.inc(operation=operation, profile=profile.name)
+
+    async def _create(self, operation: str, profile: Profile, **kwargs):
+        MODEL_PAYLOAD.observe(_payload_bytes(kwargs["messages"]),
+                              operation=operation, direction="request")
+        with span("model", operation):
+            response = await self._request(operation, **kwargs)
+        self._semaphore(kwargs["model"]).release()
+        MODEL_CALLS.inc(operation=operation, outcome="ok")
+        choice = response.choices[0]
+        self._record_usage(operation, profile, response.usage, choice.finish_reason)
+        output = choice.message.content or "".join(
+            call.function.arguments for call in choice.message.tool_calls or ())
+        MODEL_PAYLOAD.observe(len(output), operation=operation, direction="response")
+        return response
+
+    async def _stream(self, operation: str, profile: Profile, **kwargs):
+        """Open a streaming completion and yield its chunks, recording
+        time-to-first-chunk and the token usage the API sends after the
+        last chunk."""
+        MODEL_PAYLOAD.observe(_payload_bytes(kwargs["messages"]),
+                              operation=operation, direction="request")
+        with span("model", operation):
+            start = time.perf_counter()
+            stream = await self._request(
+                operation, stream=True,
+                stream_options={"include_usage": True}, **kwargs)
+            chunks = 0
+            usage = None
+            finish_reason = None
+            try:
+                async for chunk in stream:
+                    usage = getattr(chunk, "usage", None) or usage
+                    if chunk.choices:
+                        if chunks == 0:
+                            STAGE_LATENCY.observe(time.perf_counter() - start,
+                                                  stage="ttft", operation=operation)
+                        chunks += 1
+                        if chunk.choices[0].finish_reason:
+                            finish_reason = chunk.choices[0].finish_reason
+                    yield chunk
+            finally:
+                try:
+                    await stream.close()
+                finally:
+                    self._semaphore(kwargs["model"]).release()
+                MODEL_STREAM_CHUNKS.inc(chunks, operation=operation,
+                                        profile=profile.name)
+                self._record_usage(operation, profile, usage, finish_reason)
+        MODEL_CALLS.inc(operation=operation, outcome="ok")
+
+    async def aclose(self):
+        await self.client.close()
+
+    @coalesce
+    async def chat_completion(self, message: str, location: str,
+                              profile: Profile = STANDARD):
+        response = await self._create(
+            "chat_completion", profile,
+            messages=guide_messages(message, location, profile),
+            model=self.chat_model,
+            max_completion_tokens=profile.chat_max_tokens,
             temperature=0.7
         )
         return response.choices[0].message.content
 
-    def chat_completion_stream(self, message: str, location: str):
-        response = self.client.chat.completions.create(
-            stream=True,
-            messages=[
-                {"role": "system", "content": AI_GUIDE_SYSTEM_PROMPT},
-                {"role": "user", "content": message +
-                    f"for the location: {location}"}
-            ],
-            model="gpt-4.1",
-            max_completion_tokens=800,
+    async def _stream_text(self, operation: str, profile: Profile, **kwargs):
+        stream = self._stream(operation, profile, **kwargs)
+        try:
+            async for chunk in stream:
+                if chunk.choices:
+                    content = chunk.choices[0].delta.content
+                    if content:
+                        yield content
+        finally:
+            await stream.aclose()
+
+    def chat_completion_stream(self, message: str, location: str,
+                               history: list = None, profile: Profile = STANDARD):
+        """Yield the response text as it arrives.
+
+        `history` holds earlier {"role", "content"} turns of the same
+        conversation, oldest first. The model's concurrency slot is held
+        until the stream is exhausted or the generator is closed, which also
+        closes the upstream connection.
+        """
+        return self._stream_text(
+            "chat_completion_stream", profile,
+            messages=guide_messages(message, location, profile, history),
+            model=self.chat_model,
+            max_completion_tokens=profile.chat_max_tokens,
             temperature=0.7
         )
-        return response
-
-    def suggest_locations(self, location: str):
-        tools = [
-            {
-                "type": "function",
-                "function": {
-                    "name": "get_top_tourist_spots",
-                    "description": "Returns the top 5 tourist attractions near the given location with detailed metadata.",
-                    "parameters": {
-                        "type": "object",
-                        "properties": {
-                            "spots": {
-                                "type": "array",
-                                "description": "List of top tourist attractions.",
-                                "items": {
-                                    "type": "object",
-                                    "properties": {
-                                        "name": {
-                                            "type": "string",
-                                            "description": "The name of the tourist attraction in local and English."
-                                        },
-                                        "nameAr": {
-                                            "type": "string",
-                                            "description": "The Arabic name of the tourist attraction."
-                                        },
-                                        "distance": {
-                                            "type": "string",
-                                            "description": "Distance from user's location (e.g., '150m', '2.5km')."
-                                        },
-                                        "walkingTime": {
-                                            "type": "string",
-                                            "description": "Estimated walking time (e.g., '2 min', '15 min')."
-                                        },
-                                        "direction": {
-                                            "type": "string",
-                                            "description": "Direction from user's location (e.g., 'Northeast', 'South')."
-                                        },
-                                        "period": {
-                                            "type": "string",
-                                            "description": "Historical period or construction date."
-                                        },
-                                        "description": {
-                                            "type": "string",
-                                            "description": "Brief description of the tourist attraction."
-                                        },
-                                        "rating": {
-                                            "type": "number",
-                                            "description": "Rating out of 5.0."
-                                        },
-                                        "visitors": {
-                                            "type": "string",
-                                            "description": "Current visitor count (e.g., '2.3k today')."
-                                        },
-                                        "coordinates": {
-                                            "type": "object",
-                                            "properties": {
-                                                "lat": {"type": "number"},
-                                                "lng": {"type": "number"}
-                                            },
-                                            "required": ["lat", "lng"]
-                                        },
-                                        "googleMapsUrl": {
-                                            "type": "string",
-                                            "description": "Google Maps URL for the location."
-                                        },
-                                        "visitDuration": {
-                                            "type": "string",
-                                            "description": "Recommended visit duration (e.g., '15-20 min')."
-                                        },
-                                        "highlights": {
-                                            "type": "array",
-                                            "items": {"type": "string"},
-                                            "description": "Key highlights or features."
-                                        },
-                                        "tips": {
-                                            "type": "string",
-                                            "description": "Visitor tips or recommendations."
-                                        }
-                                    },
-                                    "required": ["name", "nameAr", "distance", "walkingTime", "direction", "description", "rating", "coordinates", "googleMapsUrl", "visitDuration", "highlights"]
-                                }
-                            }
-                        },
-                        "required": ["spots"]
-                    }
-                }
-            }
-        ]
 
-        response = self.client.chat.completions.create(
-            model="gpt-4.1",  # Use "gpt-4" or check your Azure deployment name
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You must provide exactly 5 tourist spots with complete details for each location requested. Always populate the spots array with 5 entries."
-                },
-                {
-                    "role": "user",
-                    "content": f"Find and list exactly 5 top tourist attractions near {location}. Include title, details, exact location, distance, walking time, entry fee, and opening hours for each spot."
-                }
-            ],
-            tools=tools,
-            tool_choice={"type": "function", "function": {
-                "name": "get_top_tourist_spots"}}
+    @coalesce
+    async def suggest_locations(self, location: str, profile: Profile = STANDARD):
+        response = await self._create(
+            "suggest_locations", profile,
+            model=self.chat_model,
+            messages=suggest_messages(location, profile),
+            tools=suggest_tools(profile),
+            tool_choice=SUGGEST_TOOL_CHOICE
         )
 
         # Extract the function arguments from the response
@@ -160,54 +471,107 @@ class OpenAIClient:
 
         return args
 
-    async def analyze_image(self, base64_image: str):
+    async def suggest_locations_stream(self, location: str,
+                                       profile: Profile = STANDARD):
+        """Yield the raw tool-call argument JSON as it is generated."""
+        stream = self._stream(
+            "suggest_locations_stream", profile,
+            model=self.chat_model,
+            messages=suggest_messages(location, profile),
+            tools=suggest_tools(profile),
+            tool_choice=SUGGEST_TOOL_CHOICE
+        )
+        try:
+            async for chunk in stream:
+                if not chunk.choices or not chunk.choices[0].delta.tool_calls:
+                    continue
+                function = chunk.choices[0].delta.tool_calls[0].function
+                if function and function.arguments:
+                    yield function.arguments
+        finally:
+            await stream.aclose()
+
+    @coalesce
+    async def analyze_image(self, base64_image: str, profile: Profile = STANDARD):
         """Analyze an image using OpenAI's vision model."""
         try:
-            response = self.client.chat.completions.create(
+            response = await self._create(
+                "analyze_image", profile,
                 model=self.vision_model,
                 messages=[
-                    {
-                        "role": "system",
-                        "content": (
-                            "You are a helpful assistant that analyzes images and "
-                            "provides detailed descriptions about tourist attractions, "
-                            "landmarks, and cultural sites in Morocco. Focus on "
-                            "historical significance, architectural details, and "
-                            "cultural importance."
-                        )
-                    },
+                    {"role": "system", "content": vision_system_prompt(profile)},
                     {
                         "role": "user",
                         "content": [
-                            {
-                                "type": "text",
-                                "text": (
-                                    "Please analyze this image and provide detailed "
-                                    "information about what you see, focusing on its "
-                                    "historical and cultural significance if it's a "
-                                    "tourist attraction or landmark."
-                                )
-                            },
-                            {
-                                "type": "image_url",
-                                "image_url": {
-                                    "url": f"data:image/jpeg;base64,{base64_image}"
-                                }
-                            }
+                            {"type": "text", "text": image_prompt(profile)},
+                            image_part(base64_image, profile)
                         ]
                     }
                 ],
-                max_tokens=500
+                max_tokens=profile.vision_max_tokens
             )
             return response.choices[0].message.content
         except Exception as e:
-            print(f"Error in analyze_image: {str(e)}")
+            logger.warning("analyze_image failed", extra={"fields": {"error": str(e)}})
             raise
 
+    def analyze_image_stream(self, base64_image: str, location: str = None,
+                             history: list = None, profile: Profile = STANDARD):
+        """Yield the description of one frame as it is generated, with the
+        earlier turns of the conversation and the user's location as context."""
+        prompt = image_prompt(profile)
+        if location:
+            prompt += f" The photo was taken at: {location}"
+        return self._stream_text(
+            "analyze_image_stream", profile,
+            model=self.vision_model,
+            messages=[
+                {"role": "system", "content": vision_system_prompt(profile)},
+                *(history or ()),
+                {
+                    "role": "user",
+                    "content": [
+                        {"type": "text", "text": prompt},
+                        image_part(base64_image, profile)
+                    ]
+                }
+            ],
+            max_tokens=profile.vision_max_tokens
+        )
+
+    @coalesce
+    async def analyze_images(self, base64_images: list, profile: Profile = STANDARD):
+        """Describe a burst of frames of one scene in a single vision call."""
+        content = [
+            {
+                "type": "text",
+                "text": (
+                    f"These {len(base64_images)} images are consecutive camera "
+                    "frames of the same scene. Combine what they show into one "
+                    "description, focusing on its historical and cultural "
+                    "significance if it's a tourist attraction or landmark. "
+                    "Do not describe the frames separately."
+                )
+            }
+        ]
+        content.extend(image_part(base64_image, profile)
+                       for base64_image in base64_images)
+        response = await self._create(
+            "analyze_images", profile,
+            model=self.vision_model,
+            messages=[
+                {"role": "system", "content": vision_system_prompt(profile)},
+                {"role": "user", "content": content}
+            ],
+            max_tokens=profile.vision_max_tokens
+        )
+        return response.choices[0].message.content
+
 
 async def main():
     client = OpenAIClient()
-    print(await client.chat_completion("Hello, how are you?"))
+    print(await client.chat_completion("Hello, how are you?", "Marrakech"))
+    await client.aclose()
 
 
 if __name__ == "__main__":
@@ -1,70 +1,284 @@
 # database.py
 import sqlite3
 import asyncio
+import base64
+import json
+import os
 from datetime import datetime
-from typing import List, Dict, Optional
+from typing import AsyncIterator, List, Dict, Optional, Tuple
+
+from metrics import logger
+from storage import SQLiteEngine
+
+# Applied in order by init_db; PRAGMA user_version records the last one run.
+MIGRATIONS = [
+    """
+    CREATE TABLE IF NOT EXISTS messages (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        user_id INTEGER NOT NULL,
+        user_message TEXT NOT NULL,
+        ai_response TEXT NOT NULL,
+        timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS idx_messages_user_timestamp
+    ON messages (user_id, timestamp, id)
+    """,
+]
+
+INSERT_MESSAGE_SQL = """
+    INSERT INTO messages (user_id, user_message, ai_response)
+    VALUES (?, ?, ?)
+"""
+
+SELECT_MESSAGES_SQL = """
+    SELECT * FROM messages
+    WHERE user_id = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ? OFFSET ?
+"""
+
+SELECT_MESSAGES_FIRST_PAGE_SQL = """
+    SELECT * FROM messages
+    WHERE user_id = ?
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+
+SELECT_MESSAGES_AFTER_CURSOR_SQL = """
+    SELECT * FROM messages
+    WHERE user_id = ? AND (timestamp, id) < (?, ?)
+    ORDER BY timestamp DESC, id DESC
+    LIMIT ?
+"""
+
+SELECT_MESSAGES_EXPORT_SQL = """
+    SELECT * FROM messages
+    WHERE user_id = ? AND (timestamp, id) > (?, ?)
+    ORDER BY timestamp, id
+    LIMIT ?
+"""
+
+SELECT_MESSAGE_SQL = "SELECT * FROM messages WHERE id = ?"
+
+DELETE_MESSAGE_SQL = "DELETE FROM messages WHERE id = ?"
+
+MAX_PAGE_SIZE = 500
+
+
+class WriteFailed(Exception):
+    """A batch of queued messages could not be committed and was dropped."""
+
+
+def encode_cursor(row: Dict) -> str:
+    raw = json.dumps([row["timestamp"], row["id"]]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def check_limit(limit: int):
+    # SQLite reads a negative LIMIT as no limit at all.
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        raise ValueError(f"limit must be between 1 and {MAX_PAGE_SIZE}")
+
+
+def decode_cursor(cursor: str) -> Tuple[str, int]:
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        timestamp, message_id = json.loads(base64.urlsafe_b64decode(padded))
+        return str(timestamp), int(message_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError("Invalid cursor") from e
 
 
 class DatabaseManager:
     def __init__(self, db_path: str = "chat_messages.db"):
         self.db_path = db_path
         self.init_db()
+        self.engine = SQLiteEngine(db_path)
+        self.queue_size = int(os.getenv("DB_WRITE_QUEUE_SIZE", "10000"))
+        self.batch_size = int(os.getenv("DB_WRITE_BATCH_SIZE", "256"))
+        self.flush_interval = float(
+            os.getenv("DB_WRITE_FLUSH_MS", "50")) / 1000
+        self.write_retries = int(os.getenv("DB_WRITE_RETRIES", "5"))
+        self.retry_backoff = float(
+            os.getenv("DB_WRITE_RETRY_BACKOFF_MS", "100")) / 1000
+        self.dropped = 0
+        self._failure: Optional[WriteFailed] = None
+        self._queue: Optional[asyncio.Queue] = None
+        self._flusher: Optional[asyncio.Task] = None
 
     def init_db(self):
         with sqlite3.connect(self.db_path) as conn:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS messages (
-                    id INTEGER PRIMARY KEY AUTOINCREMENT,
-                    user_id INTEGER NOT NULL,
-                    user_message TEXT NOT NULL,
-                    ai_response TEXT NOT NULL,
-                    timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
-                )
-            """)
+            # WAL is persistent in the database file, so set it once here.
+            conn.execute("PRAGMA journal_mode=WAL")
+            # Workers started together all get here; the immediate
+            # transaction lets one apply the migrations while the others
+            # wait and then read the new user_version.
+            conn.execute("BEGIN IMMEDIATE")
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            for number, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+                conn.execute(migration)
+                conn.execute(f"PRAGMA user_version = {number}")
             conn.commit()
 
+    async def start(self):
+        """Start the write-behind queue; until then saves write through."""
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._flusher = asyncio.create_task(self._flush_loop())
+
+    def pending(self) -> int:
+        """Messages queued but not yet committed."""
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def flush(self):
+        """Wait for queued messages to be committed. Raises WriteFailed if
+        any batch was dropped since the last flush."""
+        if self._queue is not None:
+            await self._queue.join()
+        failure, self._failure = self._failure, None
+        if failure is not None:
+            raise failure
+
+    async def close(self):
+        try:
+            if self._flusher is not None:
+                try:
+                    await self.flush()
+                finally:
+                    self._flusher.cancel()
+                    try:
+                        await self._flusher
+                    except asyncio.CancelledError:
+                        pass
+                    self._queue = self._flusher = None
+        finally:
+            self.engine.close()
+
+    async def _flush_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                    continue
+                except asyncio.QueueEmpty:
+                    pass
+                remaining = deadline - loop.time()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self._queue.get(), remaining))
+                except asyncio.TimeoutError:
+                    break
+            try:
+                await self._write_with_retry(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _write_with_retry(self, batch):
+        """Commit a batch, retrying transient errors such as a lock held
+        past busy_timeout by another worker with exponential backoff. After
+        `write_retries` retries the batch is dropped and the failure kept
+        for the next flush()."""
+        for attempt in range(self.write_retries + 1):
+            try:
+                await self._write_batch(batch)
+                return
+            except Exception as e:
+                fields = {"count": len(batch), "attempt": attempt + 1, "error": str(e)}
+                if attempt == self.write_retries:
+                    self.dropped += len(batch)
+                    logger.error("Dropped messages after retries", extra={"fields": fields})
+                    failure = WriteFailed(
+                        f"Dropped {len(batch)} messages after "
+                        f"{attempt + 1} attempts: {e}")
+                    failure.__cause__ = e
+                    self._failure = failure
+                    return
+                logger.warning("Failed to persist messages, retrying",
+                               extra={"fields": fields})
+                await asyncio.sleep(min(self.retry_backoff * 2 ** attempt, 5.0))
+
+    async def _write_batch(self, rows):
+        def _save(conn):
+            conn.executemany(INSERT_MESSAGE_SQL, rows)
+
+        await self.engine.write(_save)
+
     async def save_message(self, user_id: int, user_message: str, ai_response: str):
-        def _save():
-            with sqlite3.connect(self.db_path) as conn:
-                conn.execute("""
-                    INSERT INTO messages (user_id, user_message, ai_response)
-                    VALUES (?, ?, ?)
-                """, (user_id, user_message, ai_response))
-                conn.commit()
+        """Queue a message for the next batched commit.
 
-        await asyncio.to_thread(_save)
+        Returns as soon as the message is queued; waits only when the queue
+        is full, which pushes back on callers instead of growing memory.
+        """
+        row = (user_id, user_message, ai_response)
+        if self._queue is None:
+            await self._write_batch([row])
+            return
+        await self._queue.put(row)
 
     async def get_messages(self, user_id: int, limit: int = 50, offset: int = 0) -> List[Dict]:
-        def _get():
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.execute("""
-                    SELECT * FROM messages 
-                    WHERE user_id = ?
-                    ORDER BY timestamp DESC 
-                    LIMIT ? OFFSET ?
-                """, (user_id, limit, offset))
+        check_limit(limit)
+        if offset < 0:
+            raise ValueError("offset must not be negative")
+
+        def _get(conn):
+            cursor = conn.execute(SELECT_MESSAGES_SQL, (user_id, limit, offset))
+            return [dict(row) for row in cursor.fetchall()]
+
+        return await self.engine.read(_get)
+
+    async def get_messages_page(self, user_id: int, limit: int = 50,
+                                cursor: Optional[str] = None) -> Tuple[List[Dict], Optional[str]]:
+        """Newest-first keyset page; returns rows and the cursor of the next page."""
+        check_limit(limit)
+        position = decode_cursor(cursor) if cursor else None
+
+        def _get(conn):
+            if position is None:
+                params = (user_id, limit + 1)
+                sql = SELECT_MESSAGES_FIRST_PAGE_SQL
+            else:
+                params = (user_id, position[0], position[1], limit + 1)
+                sql = SELECT_MESSAGES_AFTER_CURSOR_SQL
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+        rows = await self.engine.read(_get)
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1])
+
+    async def iter_messages(self, user_id: int, batch_size: int = 500) -> AsyncIterator[Dict]:
+        """Yield a user's full history oldest-first, one keyset batch at a time."""
+        position = ("", 0)
+        while True:
+            def _get(conn, position=position):
+                cursor = conn.execute(SELECT_MESSAGES_EXPORT_SQL,
+                                      (user_id, position[0], position[1], batch_size))
                 return [dict(row) for row in cursor.fetchall()]
 
-        return await asyncio.to_thread(_get)
+            rows = await self.engine.read(_get)
+            for row in rows:
+                yield row
+            if len(rows) < batch_size:
+                return
+            position = (rows[-1]["timestamp"], rows[-1]["id"])
 
     async def get_message_by_id(self, message_id: int) -> Optional[Dict]:
-        def _get():
-            with sqlite3.connect(self.db_path) as conn:
-                conn.row_factory = sqlite3.Row
-                cursor = conn.execute(
-                    "SELECT * FROM messages WHERE id = ?", (message_id,))
-                row = cursor.fetchone()
-                return dict(row) if row else None
+        def _get(conn):
+            row = conn.execute(SELECT_MESSAGE_SQL, (message_id,)).fetchone()
+            return dict(row) if row else None
 
-        return await asyncio.to_thread(_get)
+        return await self.engine.read(_get)
 
     async def delete_message(self, message_id: int) -> bool:
-        def _delete():
-            with sqlite3.connect(self.db_path) as conn:
-                cursor = conn.execute(
-                    "DELETE FROM messages WHERE id = ?", (message_id,))
-                conn.commit()
-                return cursor.rowcount > 0
-
-        return await asyncio.to_thread(_delete)
+        def _delete(conn):
+            cursor = conn.execute(DELETE_MESSAGE_SQL, (message_id,))
+            return cursor.rowcount > 0
+
+        return await self.engine.write(_delete)
@@ -0,0 +1,152 @@
+import asyncio
+import json
+import time
+from typing import List
+
+import httpx
+
+FAKE_SPOTS = [
+    {"name": "Jemaa el-Fnaa", "nameAr": "ساحة جامع الفنا", "lat": 31.6258, "lng": -7.9891},
+    {"name": "Koutoubia Mosque", "nameAr": "جامع الكتبية", "lat": 31.6237, "lng": -7.9937},
+    {"name": "Bahia Palace", "nameAr": "قصر الباهية", "lat": 31.6216, "lng": -7.9827},
+    {"name": "Saadian Tombs", "nameAr": "قبور السعديين", "lat": 31.6173, "lng": -7.9885},
+    {"name": "Ben Youssef Madrasa", "nameAr": "مدرسة ابن يوسف", "lat": 31.6318, "lng": -7.9863},
+]
+
+
+def fake_spots() -> List[dict]:
+    return [
+        {
+            "name": spot["name"],
+            "nameAr": spot["nameAr"],
+            "distance": "500m",
+            "walkingTime": "6 min",
+            "direction": "North",
+            "period": "12th century",
+            "description": f"{spot['name']} is a landmark of the Marrakech medina.",
+            "rating": 4.6,
+            "visitors": "1.2k today",
+            "coordinates": {"lat": spot["lat"], "lng": spot["lng"]},
+            "googleMapsUrl": f"https://maps.google.com/?q={spot['lat']},{spot['lng']}",
+            "visitDuration": "30-45 min",
+            "highlights": ["Architecture", "History"],
+            "tips": "Visit early in the morning.",
+        }
+        for spot in FAKE_SPOTS
+    ]
+
+
+class _TokenStream(httpx.AsyncByteStream):
+    def __init__(self, events: List[bytes], token_latency: float):
+        self.events = events
+        self.token_latency = token_latency
+
+    async def __aiter__(self):
+        for event in self.events:
+            if self.token_latency:
+                await asyncio.sleep(self.token_latency)
+            yield event
+
+
+class FakeOpenAITransport(httpx.AsyncBaseTransport):
+    """Offline stand-in for the Azure OpenAI chat completions endpoint.
+
+    Answers plain, streaming and tool-call completions with canned content
+    after a configurable latency, and records how many requests were in
+    flight at once so concurrency limits can be checked without the network.
+    """
+
+    def __init__(self, latency: float = 0.05, token_latency: float = 0.0,
+                 tokens: List[str] = None, fail_first: int = 0,
+                 fail_status: int = 429):
+        self.latency = latency
+        self.token_latency = token_latency
+        self.tokens = tokens or ["Welcome ", "to ", "the ", "medina", "."]
+        self.fail_first = fail_first
+        self.fail_status = fail_status
+        self.requests = 0
+        self.in_flight = 0
+        self.max_in_flight = 0
+
+    def _completion(self, body: dict, message: dict, finish_reason: str) -> dict:
+        return {
+            "id": "chatcmpl-fake",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": len(self.tokens),
+                      "total_tokens": 10 + len(self.tokens)},
+        }
+
+    def _stream_events(self, body: dict) -> List[bytes]:
+        if body.get("tools"):
+            # Split the tool-call arguments into small pieces, like the API does.
+            arguments = json.dumps({"spots": fake_spots()})
+            deltas = [{"tool_calls": [{
+                "index": 0,
+                "id": "call_fake" if i == 0 else None,
+                "type": "function" if i == 0 else None,
+                "function": {"name": "get_top_tourist_spots" if i == 0 else None,
+                             "arguments": arguments[i:i + 24]},
+            }]} for i in range(0, len(arguments), 24)]
+        else:
+            deltas = [{"content": token} for token in self.tokens]
+
+        finish_reason = "tool_calls" if body.get("tools") else "stop"
+        chunks = [{
+            "id": "chatcmpl-fake",
+            "object": "chat.completion.chunk",
+            "created": int(time.time()),
+            "model": body.get("model", "fake"),
+            "choices": [{"index": 0, "delta": delta,
+                         "finish_reason": finish_reason if i == len(deltas) - 1 else None}],
+        } for i, delta in enumerate(deltas)]
+        if (body.get("stream_options") or {}).get("include_usage"):
+            # Like the API: one last chunk with no choices, carrying usage.
+            chunks.append({
+                "id": "chatcmpl-fake",
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": body.get("model", "fake"),
+                "choices": [],
+                "usage": {"prompt_tokens": 10, "completion_tokens": len(deltas),
+                          "total_tokens": 10 + len(deltas)},
+            })
+        events = [f"data: {json.dumps(chunk)}\n\n".encode() for chunk in chunks]
+        events.append(b"data: [DONE]\n\n")
+        return events
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        self.requests += 1
+        self.in_flight += 1
+        self.max_in_flight = max(self.max_in_flight, self.in_flight)
+        try:
+            await asyncio.sleep(self.latency)
+            if self.requests <= self.fail_first:
+                return httpx.Response(self.fail_status, json={
+                    "error": {"message": "fake failure", "code": str(self.fail_status)}})
+
+            body = json.loads(await request.aread() or b"{}")
+            if body.get("stream"):
+                return httpx.Response(
+                    200, headers={"content-type": "text/event-stream"},
+                    stream=_TokenStream(self._stream_events(body), self.token_latency))
+
+            if body.get("tools"):
+                arguments = json.dumps({"spots": fake_spots()})
+                message = {
+                    "role": "assistant",
+                    "content": None,
+                    "tool_calls": [{
+                        "id": "call_fake",
+                        "type": "function",
+                        "function": {"name": "get_top_tourist_spots", "arguments": arguments},
+                    }],
+                }
+                return httpx.Response(200, json=self._completion(body, message, "tool_calls"))
+
+            message = {"role": "assistant", "content": "".join(self.tokens)}
+            return httpx.Response(200, json=self._completion(body, message, "stop"))
+        finally:
+            self.in_flight -= 1
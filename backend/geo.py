@@ -0,0 +1,112 @@
+import math
+from typing import List, Tuple
+
+EARTH_RADIUS_M = 6371008.8
+WALKING_SPEED_M_PER_MIN = 80.0
+
+_GEOHASH_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+_COMPASS_POINTS = ["North", "Northeast", "East", "Southeast",
+                   "South", "Southwest", "West", "Northwest"]
+
+
+def parse_coordinates(coordinates: str) -> Tuple[float, float]:
+    """Parse a "lat,lng" query parameter into floats."""
+    lat, lon = map(float, coordinates.split(','))
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        raise ValueError(f"Coordinates out of range: {coordinates}")
+    return lat, lon
+
+
+def parse_trail(trail: str) -> List[Tuple[float, float]]:
+    """Parse "lat,lng" or a "lat,lng;lat,lng;..." trail, oldest first."""
+    points = [parse_coordinates(part) for part in trail.split(";") if part.strip()]
+    if not points:
+        raise ValueError("Empty location")
+    return points
+
+
+def haversine_m(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dphi = phi2 - phi1
+    dlambda = math.radians(lon2 - lon1)
+    a = math.sin(dphi / 2) ** 2 + \
+        math.cos(phi1) * math.cos(phi2) * math.sin(dlambda / 2) ** 2
+    return 2 * EARTH_RADIUS_M * math.asin(math.sqrt(a))
+
+
+def bearing_deg(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    dlambda = math.radians(lon2 - lon1)
+    x = math.sin(dlambda) * math.cos(phi2)
+    y = math.cos(phi1) * math.sin(phi2) - \
+        math.sin(phi1) * math.cos(phi2) * math.cos(dlambda)
+    return (math.degrees(math.atan2(x, y)) + 360.0) % 360.0
+
+
+def destination(lat: float, lon: float, bearing: float, distance_m: float) -> Tuple[float, float]:
+    """The point `distance_m` from (lat, lon) along the initial `bearing`."""
+    phi1, lambda1 = math.radians(lat), math.radians(lon)
+    theta = math.radians(bearing)
+    delta = distance_m / EARTH_RADIUS_M
+    phi2 = math.asin(math.sin(phi1) * math.cos(delta) +
+                     math.cos(phi1) * math.sin(delta) * math.cos(theta))
+    lambda2 = lambda1 + math.atan2(
+        math.sin(theta) * math.sin(delta) * math.cos(phi1),
+        math.cos(delta) - math.sin(phi1) * math.sin(phi2))
+    return math.degrees(phi2), (math.degrees(lambda2) + 540.0) % 360.0 - 180.0
+
+
+def compass_direction(bearing: float) -> str:
+    return _COMPASS_POINTS[int((bearing + 22.5) // 45) % 8]
+
+
+def format_distance(meters: float) -> str:
+    if meters < 1000:
+        return f"{int(round(meters))}m"
+    return f"{meters / 1000:.1f}km"
+
+
+def format_walking_time(meters: float) -> str:
+    return f"{max(1, int(round(meters / WALKING_SPEED_M_PER_MIN)))} min"
+
+
+def geohash_encode(lat: float, lon: float, precision: int = 7) -> str:
+    lat_range = [-90.0, 90.0]
+    lon_range = [-180.0, 180.0]
+    chars = []
+    bit, ch, even = 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            ch = (ch << 1) | 1
+            rng[0] = mid
+        else:
+            ch = ch << 1
+            rng[1] = mid
+        even = not even
+        bit += 1
+        if bit == 5:
+            chars.append(_GEOHASH_BASE32[ch])
+            bit, ch = 0, 0
+    return "".join(chars)
+
+
+def geohash_cell_size(precision: int) -> Tuple[float, float]:
+    """(lat, lon) size in degrees of a geohash cell at `precision`."""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def geohash_neighbors(lat: float, lon: float, precision: int):
+    """The cell containing the point plus its eight neighbours."""
+    lat_size, lon_size = geohash_cell_size(precision)
+    cells = []
+    for dlat in (-lat_size, 0.0, lat_size):
+        for dlon in (-lon_size, 0.0, lon_size):
+            cell_lat = min(max(lat + dlat, -90.0), 90.0)
+            cell_lon = (lon + dlon + 180.0) % 360.0 - 180.0
+            cell = geohash_encode(cell_lat, cell_lon, precision)
+            if cell not in cells:
+                cells.append(cell)
+    return cells
@@ -0,0 +1,237 @@
+import asyncio
+import csv
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from geo import haversine_m, parse_coordinates
+from shared_state import RateLimiter, cache_get, cache_set
+from singleflight import SingleFlight
+
+DEFAULT_PLACES_PATH = os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), "data", "places.csv")
+
+
+class OfflineGeocoder:
+    """Nearest-place lookup over a local CSV dataset (name, city, lat, lng).
+
+    Places are bucketed into a fixed-size lat/lng grid once at startup, so a
+    lookup only scans the handful of cells around the query point.
+    """
+
+    def __init__(self, path: str = None, cell_deg: float = 0.01,
+                 max_distance_m: float = None):
+        self.path = path or os.getenv("GEOCODER_PLACES_PATH",
+                                      DEFAULT_PLACES_PATH)
+        self.cell_deg = cell_deg
+        self.max_distance_m = max_distance_m or float(
+            os.getenv("GEOCODER_MAX_DISTANCE_M", "1000"))
+        self.places: List[Tuple[float, float, str]] = []
+        self._grid: Dict[Tuple[int, int], List[int]] = {}
+        self._load()
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            return
+        with open(self.path, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                address = ", ".join(
+                    part for part in (row.get("name"), row.get("city"), "Morocco") if part)
+                self.add(float(row["lat"]), float(row["lng"]), address)
+
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self.cell_deg), math.floor(lon / self.cell_deg))
+
+    def add(self, lat: float, lon: float, address: str):
+        self.places.append((lat, lon, address))
+        self._grid.setdefault(self._cell(lat, lon), []).append(
+            len(self.places) - 1)
+
+    def reverse(self, lat: float, lon: float) -> Optional[str]:
+        # One degree of latitude is ~111km; longitude cells shrink with
+        # cos(lat), so widen the ring to keep covering max_distance_m.
+        lat_ring = math.ceil(self.max_distance_m / 111_000 / self.cell_deg)
+        lon_ring = math.ceil(
+            lat_ring / max(math.cos(math.radians(lat)), 0.01))
+        row, col = self._cell(lat, lon)
+        best, best_distance = None, self.max_distance_m
+        for dr in range(-lat_ring, lat_ring + 1):
+            for dc in range(-lon_ring, lon_ring + 1):
+                for index in self._grid.get((row + dr, col + dc), ()):
+                    place_lat, place_lon, address = self.places[index]
+                    distance = haversine_m(lat, lon, place_lat, place_lon)
+                    if distance <= best_distance:
+                        best, best_distance = address, distance
+        return best
+
+
+class GeocoderBusy(Exception):
+    """The fallback could not be reached within its wait budget."""
+
+
+class NominatimGeocoder:
+    """Async wrapper around geopy's Nominatim that honours the 1 req/s policy.
+
+    Calls queue for their turn for at most `max_wait` seconds; past that
+    `reverse` raises GeocoderBusy instead of holding the request up.
+    """
+
+    def __init__(self, user_agent: str = "location_finder",
+                 min_interval: float = 1.0, timeout: float = 5.0,
+                 limiter: Optional[RateLimiter] = None,
+                 max_wait: float = None):
+        from geopy.geocoders import Nominatim
+
+        self.geolocator = Nominatim(user_agent=user_agent, timeout=timeout)
+        self.min_interval = min_interval
+        self.max_wait = max_wait if max_wait is not None else float(
+            os.getenv("GEOCODER_MAX_WAIT_S", "2"))
+        # Spaces calls across worker processes; the lock only covers this one.
+        self.limiter = limiter
+        self._lock = asyncio.Lock()
+        self._last_call = 0.0
+        self.busy = 0
+
+    async def _turn(self, deadline: float):
+        """Wait for this call's slot, raising GeocoderBusy past `deadline`."""
+        wait = self._last_call + self.min_interval - time.monotonic()
+        if time.monotonic() + max(wait, 0.0) > deadline:
+            raise GeocoderBusy()
+        if wait > 0:
+            await asyncio.sleep(wait)
+        if self.limiter is not None:
+            await asyncio.wait_for(self.limiter.acquire(),
+                                   max(deadline - time.monotonic(), 0.0))
+
+    async def reverse(self, lat: float, lon: float) -> Optional[str]:
+        from geopy.exc import GeocoderServiceError, GeocoderTimedOut
+
+        deadline = time.monotonic() + self.max_wait
+        try:
+            await asyncio.wait_for(self._lock.acquire(), self.max_wait)
+        except asyncio.TimeoutError:
+            self.busy += 1
+            raise GeocoderBusy()
+        try:
+            try:
+                await self._turn(deadline)
+            except (GeocoderBusy, asyncio.TimeoutError):
+                self.busy += 1
+                raise GeocoderBusy()
+            try:
+                location = await asyncio.to_thread(
+                    self.geolocator.reverse, f"{lat}, {lon}", exactly_one=True)
+            except (GeocoderTimedOut, GeocoderServiceError):
+                location = None
+            finally:
+                self._last_call = time.monotonic()
+        finally:
+            self._lock.release()
+        return location.address if location else None
+
+
+class ReverseGeocoder:
+    """Offline index first, optional Nominatim fallback, bounded LRU in front.
+
+    Points the fallback could not name are remembered for `negative_ttl`
+    seconds so repeat lookups answer with the raw coordinates at once.
+
+    With a shared `store`, fallback answers are also kept there so other
+    workers do not repeat the slow, rate-limited lookup."""
+
+    def __init__(self, offline: OfflineGeocoder = None,
+                 fallback: Optional[NominatimGeocoder] = None,
+                 cache_size: int = None, cache_decimals: int = None,
+                 store=None):
+        self.offline = offline or OfflineGeocoder()
+        self.fallback = fallback
+        self.store = store
+        self.shared_ttl = float(os.getenv("GEOCODER_SHARED_TTL", str(7 * 24 * 3600)))
+        self.cache_size = cache_size or int(
+            os.getenv("GEOCODER_CACHE_SIZE", "4096"))
+        self.cache_decimals = cache_decimals or int(
+            os.getenv("GEOCODER_CACHE_DECIMALS", "4"))
+        self.negative_ttl = float(os.getenv("GEOCODER_NEGATIVE_TTL", "300"))
+        self._cache: "OrderedDict[Tuple[float, float], str]" = OrderedDict()
+        self._misses: "OrderedDict[Tuple[float, float], float]" = OrderedDict()
+        self.single_flight = SingleFlight()
+
+    @classmethod
+    def from_env(cls, store=None) -> "ReverseGeocoder":
+        fallback = None
+        if os.getenv("GEOCODER_NOMINATIM", "1") == "1":
+            limiter = None
+            if store is not None:
+                limiter = RateLimiter(store, "nominatim", per_minute=60, burst=1)
+            fallback = NominatimGeocoder(limiter=limiter)
+        return cls(fallback=fallback, store=store)
+
+    def _cached(self, key) -> Optional[str]:
+        address = self._cache.get(key)
+        if address is not None:
+            self._cache.move_to_end(key)
+        return address
+
+    def _remember(self, key, address: str):
+        self._cache[key] = address
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def _missed(self, key) -> bool:
+        expires_at = self._misses.get(key)
+        if expires_at is None:
+            return False
+        if expires_at < time.monotonic():
+            del self._misses[key]
+            return False
+        return True
+
+    def _remember_miss(self, key):
+        self._misses[key] = time.monotonic() + self.negative_ttl
+        self._misses.move_to_end(key)
+        while len(self._misses) > self.cache_size:
+            self._misses.popitem(last=False)
+
+    async def reverse(self, coordinates: str) -> str:
+        lat, lon = parse_coordinates(coordinates)
+        key = (round(lat, self.cache_decimals), round(lon, self.cache_decimals))
+        address = self._cached(key)
+        if address is not None:
+            return address
+        if self._missed(key):
+            return coordinates
+
+        address = await self.single_flight.do(key, lambda: self._lookup(key, lat, lon))
+        return address if address is not None else coordinates
+
+    async def _lookup(self, key, lat: float, lon: float) -> Optional[str]:
+        address = self.offline.reverse(lat, lon)
+        if address is None and self.fallback is not None:
+            try:
+                address = await self._fallback(key, lat, lon)
+            except GeocoderBusy:
+                # Not a real miss: the point may resolve once load drops.
+                return None
+        if address is not None:
+            self._remember(key, address)
+        else:
+            self._remember_miss(key)
+        return address
+
+    async def _fallback(self, key, lat: float, lon: float) -> Optional[str]:
+        shared_key = f"geo:{key[0]},{key[1]}"
+        if self.store is not None:
+            address = await cache_get(self.store, shared_key)
+            if address is not None:
+                # An empty value records a miss another worker already paid for.
+                return address or None
+        address = await self.fallback.reverse(lat, lon)
+        if self.store is not None:
+            if address is not None:
+                await cache_set(self.store, shared_key, address, self.shared_ttl)
+            else:
+                await cache_set(self.store, shared_key, "", self.negative_ttl)
+        return address
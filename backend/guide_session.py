@@ -0,0 +1,73 @@
+import math
+import os
+from collections import deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from geo import haversine_m, parse_coordinates
+from profiles import Profile
+
+IMAGE_TURN_TEXT = "(Photo of what I am looking at.)"
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count for budgeting; English and French average about
+    four characters per token, plus a few tokens of per-message overhead."""
+    return math.ceil(len(text) / 4) + 4
+
+
+class GuideSession:
+    """State of one /ws/guide connection.
+
+    Keeps the user's resolved location, re-geocoding only after they have
+    moved `relocate_m` from where it was last resolved, and a rolling
+    conversation history trimmed, oldest turns first, to `history_tokens`.
+    """
+
+    def __init__(self, user_id: int, geocode: Callable[[str], Awaitable[str]],
+                 profile: Profile, history_tokens: int = None,
+                 relocate_m: float = None):
+        self.user_id = user_id
+        self.geocode = geocode
+        self.profile = profile
+        self.history_tokens = history_tokens or int(
+            os.getenv("GUIDE_HISTORY_TOKENS", "1500"))
+        self.relocate_m = relocate_m or float(
+            os.getenv("GUIDE_RELOCATE_M", "75"))
+        self.coordinates: Optional[str] = None
+        self.address: Optional[str] = None
+        self._resolved_at: Optional[Tuple[float, float]] = None
+        self._position: Optional[Tuple[float, float]] = None
+        self._turns: "deque[Tuple[Dict, Dict, int]]" = deque()
+        self._history_size = 0
+
+    def move(self, coordinates: str):
+        """Record a new position; raises ValueError for malformed input."""
+        self._position = parse_coordinates(coordinates)
+        self.coordinates = coordinates
+
+    async def location(self) -> Tuple[Optional[str], bool]:
+        """Return the resolved address and whether it was just refreshed."""
+        if self._position is None:
+            return None, False
+        if self._resolved_at is not None and haversine_m(
+                *self._resolved_at, *self._position) < self.relocate_m:
+            return self.address, False
+        self.address = await self.geocode(self.coordinates)
+        self._resolved_at = self._position
+        return self.address, True
+
+    def history(self) -> List[Dict]:
+        messages = []
+        for question, answer, _ in self._turns:
+            messages.extend((question, answer))
+        return messages
+
+    def remember(self, question: str, answer: str):
+        turn = ({"role": "user", "content": question},
+                {"role": "assistant", "content": answer})
+        size = estimate_tokens(question) + estimate_tokens(answer)
+        self._turns.append((*turn, size))
+        self._history_size += size
+        # Always keep the latest turn so a follow-up can refer to it.
+        while self._history_size > self.history_tokens and len(self._turns) > 1:
+            self._history_size -= self._turns.popleft()[2]
@@ -0,0 +1,125 @@
+import hashlib
+import os
+from collections import OrderedDict
+from typing import Dict, List, Optional, Set
+
+from PIL import Image
+
+HASH_BITS = 64
+BAND_BITS = 8
+BANDS = HASH_BITS // BAND_BITS
+
+
+def content_digest(data) -> str:
+    return hashlib.sha256(data).hexdigest()
+
+
+def dhash(image: Image.Image) -> int:
+    """64-bit difference hash: compares horizontally adjacent pixels of a
+    9x8 grayscale thumbnail, so it survives re-encoding and small shifts."""
+    thumb = image.convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    pixels = list(thumb.getdata())
+    value = 0
+    for row in range(8):
+        for col in range(8):
+            left = pixels[row * 9 + col]
+            right = pixels[row * 9 + col + 1]
+            value = (value << 1) | (left > right)
+    return value
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class ImageCache:
+    """Vision descriptions keyed by exact content hash and perceptual hash.
+
+    Near-duplicate lookup uses multi-index hashing: the 64-bit dHash is
+    split into 8 bands of 8 bits, and by the pigeonhole principle any hash
+    within 7 bits of the query shares at least one band exactly, so only
+    entries in the matching band buckets need a Hamming check.
+    """
+
+    def __init__(self, max_entries: int = None, max_bytes: int = None,
+                 max_distance: int = None):
+        self.max_entries = max_entries or int(
+            os.getenv("IMAGE_CACHE_MAX_ENTRIES", "2048"))
+        self.max_bytes = max_bytes or int(
+            os.getenv("IMAGE_CACHE_MAX_BYTES", str(8 * 1024 * 1024)))
+        self.max_distance = min(BANDS - 1, max_distance if max_distance is not None
+                                else int(os.getenv("IMAGE_CACHE_MAX_DISTANCE", "5")))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bands: List[Dict[int, Set[str]]] = [{} for _ in range(BANDS)]
+        self._bytes = 0
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _band_values(phash: int):
+        mask = (1 << BAND_BITS) - 1
+        for band in range(BANDS):
+            yield band, (phash >> (band * BAND_BITS)) & mask
+
+    def get_exact(self, digest: str) -> Optional[str]:
+        entry = self._entries.get(digest)
+        if entry is None:
+            return None
+        self._entries.move_to_end(digest)
+        self.exact_hits += 1
+        return entry[1]
+
+    def get_similar(self, phash: int) -> Optional[str]:
+        best, best_distance = None, self.max_distance + 1
+        seen = set()
+        for band, value in self._band_values(phash):
+            for digest in self._bands[band].get(value, ()):
+                if digest in seen:
+                    continue
+                seen.add(digest)
+                distance = hamming(phash, self._entries[digest][0])
+                if distance < best_distance:
+                    best, best_distance = digest, distance
+        if best is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(best)
+        self.near_hits += 1
+        return self._entries[best][1]
+
+    def put(self, digest: str, phash: int, description: str):
+        if digest in self._entries:
+            self._remove(digest)
+        size = len(description.encode("utf-8"))
+        self._entries[digest] = (phash, description, size)
+        self._bytes += size
+        for band, value in self._band_values(phash):
+            self._bands[band].setdefault(value, set()).add(digest)
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+
+    def _remove(self, digest: str):
+        phash, _, size = self._entries.pop(digest)
+        self._bytes -= size
+        for band, value in self._band_values(phash):
+            bucket = self._bands[band].get(value)
+            if bucket is not None:
+                bucket.discard(digest)
+                if not bucket:
+                    del self._bands[band][value]
+
+    def stats(self) -> Dict:
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": (self.exact_hits + self.near_hits) / lookups if lookups else 0.0,
+        }
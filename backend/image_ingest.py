@@ -0,0 +1,125 @@
+import asyncio
+import base64
+import io
+import os
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import List, Optional
+
+from fastapi import UploadFile
+from PIL import Image, ImageFilter, ImageOps, ImageStat
+
+from image_cache import dhash, hamming
+
+MAX_UPLOAD_BYTES = int(os.getenv("IMAGE_MAX_UPLOAD_BYTES", str(1 * 1024 * 1024)))
+MAX_EDGE = int(os.getenv("IMAGE_MAX_EDGE", "1024"))
+JPEG_QUALITY = int(os.getenv("IMAGE_JPEG_QUALITY", "80"))
+SHARPNESS_EDGE = 256
+BURST_MAX_FILES = int(os.getenv("IMAGE_BURST_MAX_FILES", "8"))
+BURST_MAX_FRAMES = int(os.getenv("IMAGE_BURST_MAX_FRAMES", "3"))
+BURST_MIN_DISTANCE = int(os.getenv("IMAGE_BURST_MIN_DISTANCE", "4"))
+READ_CHUNK = 64 * 1024
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+@dataclass
+class PreparedImage:
+    jpeg: bytes
+    phash: int
+    width: int
+    height: int
+    sharpness: float = 0.0
+
+
+async def read_upload(file: UploadFile, max_bytes: int = MAX_UPLOAD_BYTES) -> bytearray:
+    """Read an upload once into a single buffer, failing as soon as it
+    grows past `max_bytes`."""
+    capacity = min(file.size, max_bytes) if file.size is not None else max_bytes
+    buffer = bytearray(capacity + 1)
+    view = memoryview(buffer)
+    size = 0
+    while True:
+        chunk = await file.read(READ_CHUNK)
+        if not chunk:
+            break
+        end = size + len(chunk)
+        if end > max_bytes:
+            raise UploadTooLarge(
+                f"File size exceeds {max_bytes / (1024 * 1024):g}MB limit")
+        if end > len(buffer):
+            # The declared size was wrong; grow up to the cap.
+            view.release()
+            buffer.extend(bytes(min(max_bytes + 1, 2 * end) - len(buffer)))
+            view = memoryview(buffer)
+        view[size:end] = chunk
+        size = end
+    view.release()
+    # Trimming in place keeps the buffer picklable for the worker process.
+    del buffer[size:]
+    return buffer
+
+
+def prepare_image(data: bytes, max_edge: int = MAX_EDGE,
+                  quality: int = JPEG_QUALITY) -> PreparedImage:
+    """Decode, orient, downscale and re-encode a frame as JPEG.
+
+    Runs in a worker process; JPEG sources are draft-decoded at a reduced
+    scale so large camera frames never decode at full resolution.
+    """
+    image = Image.open(io.BytesIO(data))
+    image.draft("RGB", (max_edge, max_edge))
+    image = ImageOps.exif_transpose(image).convert("RGB")
+    image.thumbnail((max_edge, max_edge), Image.Resampling.LANCZOS)
+    out = io.BytesIO()
+    image.save(out, "JPEG", quality=quality)
+    return PreparedImage(out.getvalue(), dhash(image), image.width,
+                         image.height, sharpness(image))
+
+
+def sharpness(image: Image.Image) -> float:
+    """Variance of the edge response of a small grayscale copy; blurred or
+    motion-smeared frames have few strong edges and score low."""
+    gray = image.convert("L")
+    gray.thumbnail((SHARPNESS_EDGE, SHARPNESS_EDGE))
+    return ImageStat.Stat(gray.filter(ImageFilter.FIND_EDGES)).var[0]
+
+
+def select_frames(images: List[PreparedImage], max_frames: int,
+                  min_distance: int) -> List[PreparedImage]:
+    """Pick the sharpest frames, skipping any whose dHash is within
+    `min_distance` bits of a frame already picked."""
+    selected = []
+    for image in sorted(images, key=lambda i: i.sharpness, reverse=True):
+        if all(hamming(image.phash, other.phash) >= min_distance for other in selected):
+            selected.append(image)
+            if len(selected) == max_frames:
+                break
+    return selected
+
+
+def b64encode(data) -> str:
+    return base64.b64encode(data).decode("ascii")
+
+
+class ImageProcessor:
+    """Runs `prepare_image` in a process pool, away from the event loop."""
+
+    def __init__(self, workers: int = None):
+        self.workers = workers or int(os.getenv("IMAGE_WORKERS", "2"))
+        self._executor: Optional[ProcessPoolExecutor] = None
+
+    async def prepare(self, data) -> PreparedImage:
+        """`data` must be picklable (bytes or bytearray): it is copied to
+        the worker process."""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.workers)
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, prepare_image, data)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+            self._executor = None
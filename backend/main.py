@@ -1,19 +1,81 @@
 # main.py
-from fastapi import FastAPI, HTTPException, UploadFile, File
-from fastapi.responses import StreamingResponse
+from fastapi import (FastAPI, HTTPException, Query, Request, Response, UploadFile,
+                     File, WebSocket, WebSocketDisconnect)
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from starlette.websockets import WebSocketState
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Callable, List, Optional
 import time
-import base64
 import asyncio
-from client import OpenAIClient
-from database import DatabaseManager
+import json
+import os
+from client import OpenAIClient, spot_schema
+from database import MAX_PAGE_SIZE, DatabaseManager, WriteFailed
+from geo import parse_coordinates, parse_trail
+from geocoder import ReverseGeocoder
+from guide_session import IMAGE_TURN_TEXT, GuideSession
+from image_cache import ImageCache, content_digest
+from image_ingest import (
+    BURST_MAX_FILES,
+    BURST_MAX_FRAMES,
+    BURST_MIN_DISTANCE,
+    MAX_UPLOAD_BYTES,
+    ImageProcessor,
+    UploadTooLarge,
+    b64encode,
+    read_upload,
+    select_frames,
+)
+from metrics import REGISTRY, MetricsMiddleware, logger, setup_logging, span
+from poi_store import POIStore
+from prefetch import PrefetchScheduler
+from profiles import Profile, route_profile
+from semantic_cache import SemanticCache
+from shared_state import LocalStore, shared_store_from_env
+from stream_json import ArrayItemParser, validate
+from suggestion_cache import SuggestionCache
 from fastapi.middleware.cors import CORSMiddleware
-from geopy.geocoders import Nominatim
-from geopy.exc import GeocoderTimedOut, GeocoderServiceError
+from contextlib import asynccontextmanager
+
+
+SHUTDOWN_TIMEOUT_S = float(os.getenv("SHUTDOWN_TIMEOUT_S", "10"))
+
+shared_store = shared_store_from_env()
+# Caches only go through the store when other workers can read it.
+cache_store = None if isinstance(shared_store, LocalStore) else shared_store
+openai_client = OpenAIClient(store=shared_store)
+db_manager = DatabaseManager()
+suggestion_cache = SuggestionCache(store=cache_store)
+geocoder = ReverseGeocoder.from_env(store=cache_store)
+image_cache = ImageCache()
+image_processor = ImageProcessor()
+poi_store = POIStore()
+chat_cache = SemanticCache()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    setup_logging()
+    await db_manager.start()
+    yield
+    # Let in-flight saves reach the write queue before it is drained.
+    if background_tasks:
+        _, stuck = await asyncio.wait(set(background_tasks), timeout=SHUTDOWN_TIMEOUT_S)
+        if stuck:
+            logger.warning("Background tasks still running at shutdown",
+                           extra={"fields": {"count": len(stuck)}})
+    await prefetcher.close()
+    # Drain queued chat messages before the process exits.
+    try:
+        await db_manager.close()
+    except WriteFailed as e:
+        logger.error("Chat messages lost at shutdown", extra={"fields": {"error": str(e)}})
+    await openai_client.aclose()
+    image_processor.close()
+    await shared_store.close()
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 
 # https://linkyfire.vet/ api.linkyfire.vet
 app.add_middleware(
@@ -23,10 +85,9 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
-
-openai_client = OpenAIClient()
-db_manager = DatabaseManager()
+app.add_middleware(MetricsMiddleware)
 
 
 class MessageRequest(BaseModel):
@@ -45,28 +106,102 @@ class MessageHistory(BaseModel):
     timestamp: str
 
 
-def coordinates_to_location(coordinates: str):
-    lat, lon = map(float, coordinates.split(','))
+async def coordinates_to_location(coordinates: str):
+    with span("geocode"):
+        return await geocoder.reverse(coordinates)
 
-    # Initialize geocoder
-    geolocator = Nominatim(user_agent="location_finder")
 
-    # Reverse geocode
-    location = geolocator.reverse(f"{lat}, {lon}", exactly_one=True)
+async def warm_tile(lat: float, lon: float):
+    """Geocode a point ahead of the user and, if no cached or local answer
+    covers it, fetch its suggestions."""
+    address = await coordinates_to_location(f"{lat:.6f},{lon:.6f}")
+    # The scheduler only checked this worker; another may have the tile.
+    if is_tile_warm(lat, lon) or await suggestion_cache.contains_shared(lat, lon):
+        return
+    # The route's profile, so a request arriving mid-prefetch joins this
+    # call instead of starting its own.
+    profile = route_profile("suggest")
+    with span("prefetch", "suggest_locations"):
+        response = await openai_client.suggest_locations(address, profile=profile)
+    if profile.complete:
+        await remember_suggestions(lat, lon, response)
+
+
+def is_tile_warm(lat: float, lon: float) -> bool:
+    return suggestion_cache.contains(lat, lon) or poi_store.suggest(lat, lon) is not None
+
+
+prefetcher = PrefetchScheduler(warm_tile, is_tile_warm, suggestion_cache.tile)
+
+
+def track(user_id: int, location: str) -> str:
+    """Feed a position, or a "lat,lng;lat,lng;..." trail ending at the
+    current position, to the prefetcher and return the current "lat,lng".
+    Malformed input is returned unchanged for the route to reject."""
+    try:
+        trail = parse_trail(location)
+    except ValueError:
+        return location
+    prefetcher.observe(user_id, trail)
+    return location.rstrip("; ").rsplit(";", 1)[-1].strip()
+
+
+def resolve_profile(route: str, requested: Optional[str]) -> Profile:
+    try:
+        return route_profile(route, requested)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def chat_tile(profile: Profile, lat: float, lon: float) -> str:
+    # Tiers answer at different lengths, so each gets its own partition.
+    return f"{profile.name}/{chat_cache.tile(lat, lon)}"
 
-    if location:
-        return location.address
-    else:
-        return coordinates
+
+def sse_event(data: str, event: Optional[str] = None) -> str:
+    """Format one text/event-stream event; multi-line data gets one
+    `data:` field per line so clients reassemble it with newlines."""
+    lines = [f"event: {event}"] if event else []
+    lines.extend(f"data: {line}" for line in data.split("\n"))
+    return "\n".join(lines) + "\n\n"
+
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+background_tasks = set()
+
+
+def run_in_background(coro):
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    task.add_done_callback(_log_failure)
+    return task
+
+
+def _log_failure(task: asyncio.Task):
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task failed", exc_info=task.exception())
 
 
 @app.post("/chat", response_model=MessageResponse)
-async def chat_with_openai(request: MessageRequest, user_id: int, location: str):
+async def chat_with_openai(request: MessageRequest, user_id: int, location: str,
+                           profile: Optional[str] = None):
+    model_profile = resolve_profile("chat", profile)
+    location = track(user_id, location)
     try:
-        ai_response = await openai_client.chat_completion(
-            message=request.message,
-            location=coordinates_to_location(location)
-        )
+        tile = chat_tile(model_profile, *parse_coordinates(location))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid location")
+    try:
+        ai_response = chat_cache.get(tile, request.message)
+        if ai_response is None:
+            ai_response = await openai_client.chat_completion(
+                message=request.message,
+                location=await coordinates_to_location(location),
+                profile=model_profile
+            )
+            chat_cache.put(tile, request.message, ai_response)
 
         await db_manager.save_message(
             user_id=user_id,
@@ -80,28 +215,133 @@ async def chat_with_openai(request: MessageRequest, user_id: int, location: str)
 
 
 @app.get("/suggest-locations")
-async def suggest_locations(user_id: int, location: str):
+async def suggest_locations(user_id: int, location: str, profile: Optional[str] = None):
     if not user_id or not location:
         raise HTTPException(
             status_code=400, detail="User ID and location are required")
+    model_profile = resolve_profile("suggest", profile)
+    location = track(user_id, location)
     try:
-        response = openai_client.suggest_locations(
-            coordinates_to_location(location))
-        return response
+        lat, lon = parse_coordinates(location)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid location")
+    try:
+        cached = await suggestion_cache.fetch(lat, lon)
+        if cached is not None:
+            return cached
+        local = poi_store.suggest(lat, lon)
+        if local is not None:
+            return local
+
+        # Sparse coverage: ask the model and learn its spots for next time.
+        response = await openai_client.suggest_locations(
+            await coordinates_to_location(location), profile=model_profile)
+        if model_profile.complete:
+            # Cache writes can wait; a locked database must not turn an
+            # answer the model already gave into a 500.
+            run_in_background(remember_suggestions(lat, lon, response))
+        return suggestion_cache.rank(response, lat, lon)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
 
+async def remember_suggestions(lat: float, lon: float, response: dict):
+    await poi_store.add_spots(response.get("spots", []), lat, lon)
+    await suggestion_cache.put(lat, lon, response)
+
+
+@app.get("/suggest-locations/stream")
+async def suggest_locations_stream(http_request: Request, user_id: int, location: str,
+                                   profile: Optional[str] = None):
+    """Server-sent `spot` events, one per attraction as soon as the model
+    has finished writing it, followed by `data: [DONE]`."""
+    model_profile = resolve_profile("suggest", profile)
+    location = track(user_id, location)
+    try:
+        lat, lon = parse_coordinates(location)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid location")
+
+    known = await suggestion_cache.fetch(lat, lon) or poi_store.suggest(lat, lon)
+    if known is not None:
+        async def replay():
+            for spot in known["spots"]:
+                yield sse_event(json.dumps(spot, ensure_ascii=False), event="spot")
+            yield sse_event("[DONE]")
+
+        return StreamingResponse(replay(), media_type="text/event-stream",
+                                 headers=SSE_HEADERS)
+
+    try:
+        resolved_location = await coordinates_to_location(location)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
+    arguments = openai_client.suggest_locations_stream(
+        resolved_location, profile=model_profile)
+    schema = spot_schema(model_profile)
+
+    async def generate():
+        parser = ArrayItemParser("spots")
+        spots = []
+        try:
+            async for text in arguments:
+                for spot in parser.feed(text):
+                    if not validate(spot, schema):
+                        continue
+                    spots.append(spot)
+                    for ranked in suggestion_cache.rank({"spots": [spot]}, lat, lon)["spots"]:
+                        yield sse_event(json.dumps(ranked, ensure_ascii=False), event="spot")
+                if await http_request.is_disconnected():
+                    return
+        except Exception as e:
+            yield sse_event(json.dumps({"detail": f"Error: {str(e)}"}), event="error")
+            return
+        finally:
+            await arguments.aclose()
+
+        yield sse_event("[DONE]")
+        if model_profile.complete:
+            run_in_background(remember_suggestions(lat, lon, {"spots": spots}))
+
+    return StreamingResponse(generate(), media_type="text/event-stream",
+                             headers=SSE_HEADERS)
+
+
 @app.get("/messages", response_model=List[MessageHistory])
-async def get_messages(user_id: int, limit: int = 50, offset: int = 0):
+async def get_messages(response: Response, user_id: int,
+                       limit: int = Query(50, ge=1, le=MAX_PAGE_SIZE),
+                       offset: int = Query(0, ge=0), cursor: Optional[str] = None):
+    """Newest-first history. Pass the `X-Next-Cursor` header of one page as
+    `cursor` to get the next; `offset` is kept for older clients."""
     try:
-        messages = await db_manager.get_messages(user_id=user_id, limit=limit, offset=offset)
+        if offset:
+            return await db_manager.get_messages(user_id=user_id, limit=limit, offset=offset)
+        messages, next_cursor = await db_manager.get_messages_page(
+            user_id=user_id, limit=limit, cursor=cursor)
+        if next_cursor:
+            response.headers["X-Next-Cursor"] = next_cursor
         return messages
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         raise HTTPException(
             status_code=500, detail=f"Database error: {str(e)}")
 
 
+@app.get("/messages/export")
+async def export_messages(user_id: int):
+    """Stream a user's full history oldest-first as NDJSON."""
+    async def generate():
+        async for message in db_manager.iter_messages(user_id):
+            yield json.dumps(message, ensure_ascii=False) + "\n"
+
+    return StreamingResponse(
+        generate(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="messages-{user_id}.ndjson"'}
+    )
+
+
 @app.get("/messages/{message_id}", response_model=MessageHistory)
 async def get_message(message_id: int):
     try:
@@ -131,80 +371,331 @@ async def delete_message(message_id: int):
 
 
 @app.post("/chat/stream")
-async def chat_stream(request: MessageRequest):
+async def chat_stream(request: MessageRequest, http_request: Request,
+                      user_id: int, location: str, profile: Optional[str] = None):
+    model_profile = resolve_profile("chat_stream", profile)
+    location = track(user_id, location)
     try:
-        start_time = time.time()
-        response_parts = []
-
-        response = openai_client.chat_completion_stream(
-            message=request.message
-        )
-
-        def generate():
-            nonlocal response_parts
-            for chunk in response:
-                if chunk.choices:
-                    content = chunk.choices[0].delta.content
-                    if content:
-                        response_parts.append(content)
-                        yield f"data: {content}\n\n"
-            yield "data: [DONE]\n\n"
-
-            # Save to database after streaming completes
-            full_response = ''.join(response_parts)
-            response_time_ms = int((time.time() - start_time) * 1000)
-
-            asyncio.create_task(db_manager.save_message(
-                user_message=request.message,
-                system_prompt=request.system_prompt,
-                ai_response=full_response,
-                response_time_ms=response_time_ms
-            ))
-
-        return StreamingResponse(generate(), media_type="text/plain")
+        parse_coordinates(location)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid location")
+    try:
+        start_time = time.perf_counter()
+        resolved_location = await coordinates_to_location(location)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error: {str(e)}")
 
+    response = openai_client.chat_completion_stream(
+        message=request.message,
+        location=resolved_location,
+        profile=model_profile
+    )
+
+    async def generate():
+        response_parts = []
+        first_token_time = None
+        try:
+            async for content in response:
+                if first_token_time is None:
+                    first_token_time = time.perf_counter()
+                response_parts.append(content)
+                yield sse_event(content)
+                if await http_request.is_disconnected():
+                    return
+        except Exception as e:
+            yield sse_event(json.dumps({"detail": f"Error: {str(e)}"}), event="error")
+            return
+        finally:
+            # Closing the generator closes the upstream HTTP stream, so a
+            # client that goes away stops paying for tokens immediately.
+            await response.aclose()
+
+        # Save before the closing events: a client that leaves after the
+        # last token closes this generator at the next yield.
+        run_in_background(db_manager.save_message(
+            user_id=user_id,
+            user_message=request.message,
+            ai_response="".join(response_parts)
+        ))
+        end_time = time.perf_counter()
+        generation_time = end_time - (first_token_time or end_time)
+        yield sse_event(json.dumps({
+            "ttft_ms": int(((first_token_time or end_time) - start_time) * 1000),
+            "total_ms": int((end_time - start_time) * 1000),
+            "tokens": len(response_parts),
+            "tokens_per_sec": round(len(response_parts) / generation_time, 1)
+            if generation_time > 0 else None,
+        }), event="metrics")
+        yield sse_event("[DONE]")
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers=SSE_HEADERS
+    )
+
+
+async def send_answer(websocket: WebSocket, tokens,
+                      on_answer: Callable[[str], None]) -> str:
+    """Relay a token stream as `token` messages, then a `done` message.
+    `on_answer` gets the full answer before `done` is sent, so it still
+    runs when the client leaves right after the last token."""
+    start = time.perf_counter()
+    first_token_time = None
+    parts = []
+    try:
+        async for text in tokens:
+            if first_token_time is None:
+                first_token_time = time.perf_counter()
+            parts.append(text)
+            await websocket.send_json({"type": "token", "text": text})
+    finally:
+        await tokens.aclose()
+    answer = "".join(parts)
+    on_answer(answer)
+    end_time = time.perf_counter()
+    await websocket.send_json({
+        "type": "done",
+        "ttft_ms": int(((first_token_time or end_time) - start) * 1000),
+        "total_ms": int((end_time - start) * 1000),
+    })
+    return answer
+
+
+async def send_cached(websocket: WebSocket, answer: str,
+                      on_answer: Callable[[str], None]):
+    on_answer(answer)
+    await websocket.send_json({"type": "token", "text": answer})
+    await websocket.send_json({"type": "done", "ttft_ms": 0, "total_ms": 0})
+
+
+async def refresh_location(websocket: WebSocket, session: GuideSession) -> Optional[str]:
+    address, refreshed = await session.location()
+    if refreshed:
+        await websocket.send_json({"type": "location", "address": address})
+    return address
+
+
+async def guide_question(websocket: WebSocket, session: GuideSession, question: str):
+    address = await refresh_location(websocket, session)
+    history = session.history()
+    tile = (chat_tile(session.profile, *parse_coordinates(session.coordinates))
+            if session.coordinates else None)
+    # Follow-ups depend on the conversation, so only opening questions are
+    # shared through the semantic cache.
+    answer = chat_cache.get(tile, question) if tile and not history else None
+
+    def finish(answer: str, fresh: bool):
+        if fresh and tile and not history:
+            chat_cache.put(tile, question, answer)
+        session.remember(question, answer)
+        run_in_background(db_manager.save_message(
+            user_id=session.user_id, user_message=question, ai_response=answer))
+
+    if answer is not None:
+        await send_cached(websocket, answer, lambda a: finish(a, False))
+    else:
+        await send_answer(websocket, openai_client.chat_completion_stream(
+            message=question, location=address or "Morocco", history=history,
+            profile=session.profile), lambda a: finish(a, True))
+
+
+async def guide_frame(websocket: WebSocket, session: GuideSession, data: bytes):
+    if len(data) > MAX_UPLOAD_BYTES:
+        await websocket.send_json({
+            "type": "error",
+            "detail": f"Frame exceeds {MAX_UPLOAD_BYTES // 2**20}MB limit"})
+        return
+    digest = content_digest(data)
+    answer = image_cache.get_exact(digest)
+    if answer is None:
+        try:
+            with span("image_prepare", "ws_guide"):
+                image = await image_processor.prepare(data)
+        except Exception:
+            await websocket.send_json({"type": "error", "detail": "Invalid image"})
+            return
+        answer = image_cache.get_similar(image.phash)
+
+    def finish(answer: str, fresh: bool):
+        if fresh and session.profile.complete:
+            image_cache.put(digest, image.phash, answer)
+        session.remember(IMAGE_TURN_TEXT, answer)
+
+    if answer is not None:
+        await send_cached(websocket, answer, lambda a: finish(a, False))
+    else:
+        address = await refresh_location(websocket, session)
+        await send_answer(websocket, openai_client.analyze_image_stream(
+            b64encode(image.jpeg), location=address,
+            history=session.history(), profile=session.profile),
+            lambda a: finish(a, True))
+
+
+@app.websocket("/ws/guide")
+async def guide(websocket: WebSocket, user_id: int, location: Optional[str] = None,
+                profile: Optional[str] = None):
+    """Hands-free guide session over one connection.
+
+    Client to server: binary messages are camera frames (JPEG/PNG); text
+    messages are questions, either plain text or
+    `{"type": "question", "text": ...}`, and
+    `{"type": "location", "location": "lat,lng"}` reports a new position.
+
+    Server to client, all JSON: `{"type": "token", "text"}` pieces of the
+    answer, `{"type": "done", "ttft_ms", "total_ms"}` after each answer,
+    `{"type": "location", "address"}` when the position resolves to a new
+    place and `{"type": "error", "detail"}`. Answers see the earlier turns
+    of the session and default to the fast profile.
+    """
+    await websocket.accept()
+    try:
+        model_profile = route_profile("guide", profile)
+    except ValueError as e:
+        await websocket.close(code=1008, reason=str(e))
+        return
+    session = GuideSession(user_id, coordinates_to_location, model_profile)
+    try:
+        if location:
+            try:
+                session.move(track(user_id, location))
+            except ValueError:
+                await websocket.close(code=1008, reason="Invalid location")
+                return
+            await refresh_location(websocket, session)
 
-@app.post("/analyze-image", response_model=MessageResponse)
-async def process_image(file: UploadFile = File(...), user_id: int = None):
-    try:
-        # Check file size limit (1MB = 1 * 1024 * 1024 bytes)
-        file_size = 0
-        MAX_FILE_SIZE = 1 * 1024 * 1024  # 1MB in bytes
-        
-        # Read file in chunks to get size
-        chunk_size = 1024  # 1KB chunks
         while True:
-            chunk = await file.read(chunk_size)
-            if not chunk:
-                break
-            file_size += len(chunk)
-            if file_size > MAX_FILE_SIZE:
-                raise HTTPException(
-                    status_code=400,
-                    detail="File size exceeds 1MB limit"
-                )
-        
-        # Reset file position for full read
-        await file.seek(0)
-        
-        # Read the image file
-        image_content = await file.read()
-        print(f"Received image: {file.filename}, size: {file_size} bytes")
-
-        # Convert to base64
-        base64_image = base64.b64encode(image_content).decode('utf-8')
-        print(f"Base64 image size: {len(base64_image)} characters")
-        print("Base64 image conversion successful")
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+            try:
+                if message.get("bytes") is not None:
+                    await guide_frame(websocket, session, message["bytes"])
+                    continue
+                text = message.get("text") or ""
+                try:
+                    payload = json.loads(text)
+                except ValueError:
+                    payload = None
+                if not isinstance(payload, dict):
+                    payload = {"type": "question", "text": text}
+
+                if payload.get("type") == "location":
+                    try:
+                        session.move(track(user_id, str(payload.get("location", ""))))
+                    except ValueError:
+                        await websocket.send_json(
+                            {"type": "error", "detail": "Invalid location"})
+                        continue
+                    await refresh_location(websocket, session)
+                elif payload.get("type") == "question" and str(payload.get("text", "")).strip():
+                    await guide_question(websocket, session, str(payload["text"]))
+                else:
+                    await websocket.send_json(
+                        {"type": "error", "detail": "Unknown message"})
+            except WebSocketDisconnect:
+                raise
+            except Exception as e:
+                if WebSocketState.DISCONNECTED in (websocket.client_state,
+                                                   websocket.application_state):
+                    return
+                logger.exception("ws_guide message failed")
+                try:
+                    await websocket.send_json({"type": "error", "detail": f"Error: {str(e)}"})
+                except (RuntimeError, WebSocketDisconnect):
+                    # The failure was a send on a closed socket: the client is gone.
+                    return
+    except WebSocketDisconnect:
+        return
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    return {
+        "suggestions": suggestion_cache.stats(),
+        "images": image_cache.stats(),
+        "chat": chat_cache.stats(),
+        "prefetch": prefetcher.stats(),
+        "single_flight": {
+            "openai": openai_client.single_flight.stats(),
+            "geocoder": geocoder.single_flight.stats(),
+        },
+    }
+
+
+def cache_gauges():
+    gauges = {}
+    for name, stats in (("suggestions", suggestion_cache.stats()),
+                        ("images", image_cache.stats()),
+                        ("chat", chat_cache.stats())):
+        for key, value in stats.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                gauges[f"medina_cache_{name}_{key}"] = value
+    for name, flight in (("openai", openai_client.single_flight),
+                         ("geocoder", geocoder.single_flight)):
+        for key, value in flight.stats().items():
+            gauges[f"medina_single_flight_{name}_{key}"] = value
+    for key, value in prefetcher.stats().items():
+        gauges[f"medina_prefetch_{key}"] = value
+    if geocoder.fallback is not None:
+        gauges["medina_geocoder_fallback_busy"] = geocoder.fallback.busy
+    gauges["medina_db_write_queue_depth"] = db_manager.pending()
+    gauges["medina_db_write_dropped"] = db_manager.dropped
+    return gauges
+
+
+REGISTRY.register_collector(cache_gauges)
+
+
+@app.get("/metrics")
+async def metrics(format: str = "prometheus"):
+    """Prometheus text exposition; `?format=json` returns the same data with
+    p50/p95/p99 estimates per series."""
+    if format == "json":
+        return REGISTRY.snapshot()
+    return PlainTextResponse(REGISTRY.render(),
+                             media_type="text/plain; version=0.0.4")
+
+
+@app.post("/analyze-image", response_model=MessageResponse)
+async def process_image(file: UploadFile = File(...), user_id: int = None,
+                        profile: Optional[str] = None):
+    model_profile = resolve_profile("image", profile)
+    try:
+        try:
+            image_content = await read_upload(file)
+        except UploadTooLarge as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        logger.info("Received image", extra={"fields": {
+            "filename": file.filename, "bytes": len(image_content)}})
+
+        digest = content_digest(image_content)
+        cached = image_cache.get_exact(digest)
+        if cached is not None:
+            return MessageResponse(response=cached)
+        try:
+            with span("image_prepare"):
+                image = await image_processor.prepare(image_content)
+        except Exception:
+            raise HTTPException(status_code=400, detail="Invalid image file")
+        cached = image_cache.get_similar(image.phash)
+        if cached is not None:
+            return MessageResponse(response=cached)
+
+        base64_image = b64encode(image.jpeg)
+        logger.debug("Prepared image", extra={"fields": {
+            "width": image.width, "height": image.height,
+            "base64_chars": len(base64_image)}})
 
         try:
             # Get response from OpenAI
-            ai_response = await openai_client.analyze_image(base64_image)
-            print("AI Response received successfully")
+            ai_response = await openai_client.analyze_image(
+                base64_image, profile=model_profile)
+            if model_profile.complete:
+                image_cache.put(digest, image.phash, ai_response)
             return MessageResponse(response=ai_response)
         except Exception as openai_error:
-            print(f"OpenAI API Error: {str(openai_error)}")
+            logger.error("OpenAI API error", extra={"fields": {"error": str(openai_error)}})
             raise HTTPException(
                 status_code=500,
                 detail=f"Error from OpenAI API: {str(openai_error)}"
@@ -212,12 +703,67 @@ async def process_image(file: UploadFile = File(...), user_id: int = None):
     except HTTPException:
         raise
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
+        logger.exception("Unexpected error in /analyze-image")
         raise HTTPException(
             status_code=500,
             detail=f"Error processing image: {str(e)}")
 
 
+@app.post("/analyze-images", response_model=MessageResponse)
+async def process_images(files: List[UploadFile] = File(...), user_id: int = None,
+                         profile: Optional[str] = None):
+    """Describe a burst of frames of one scene with a single vision call.
+
+    Only the sharpest, mutually distinct frames are sent to the model."""
+    model_profile = resolve_profile("image", profile)
+    if len(files) > BURST_MAX_FILES:
+        raise HTTPException(
+            status_code=400, detail=f"At most {BURST_MAX_FILES} frames per request")
+    try:
+        uploads = []
+        for file in files:
+            try:
+                uploads.append(await read_upload(file))
+            except UploadTooLarge as e:
+                raise HTTPException(status_code=400, detail=str(e))
+
+        digests = [content_digest(upload) for upload in uploads]
+        for digest in digests:
+            cached = image_cache.get_exact(digest)
+            if cached is not None:
+                return MessageResponse(response=cached)
+
+        with span("image_prepare", "burst"):
+            results = await asyncio.gather(
+                *(image_processor.prepare(upload) for upload in uploads),
+                return_exceptions=True)
+        frames = {}
+        for digest, result in zip(digests, results):
+            if not isinstance(result, BaseException):
+                frames[digest] = result
+        if not frames:
+            raise HTTPException(status_code=400, detail="No valid image files")
+
+        selected = select_frames(
+            list(frames.values()), BURST_MAX_FRAMES, BURST_MIN_DISTANCE)
+        cached = image_cache.get_similar(selected[0].phash)
+        if cached is not None:
+            return MessageResponse(response=cached)
+
+        ai_response = await openai_client.analyze_images(
+            [b64encode(frame.jpeg) for frame in selected], profile=model_profile)
+        if model_profile.complete:
+            for digest, frame in frames.items():
+                image_cache.put(digest, frame.phash, ai_response)
+        return MessageResponse(response=ai_response)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=500,
+            detail=f"Error processing images: {str(e)}")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,300 @@
+import atexit
+import json
+import logging
+import logging.handlers
+import os
+import queue
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25,
+                   0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096)
+
+logger = logging.getLogger("medina")
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    parts = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+def _format_number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self._values.items()):
+            lines.append(f"{self.name}{_format_labels(self.labelnames, key)} {_format_number(value)}")
+        return lines
+
+    def snapshot(self) -> List[Dict]:
+        return [{"labels": dict(zip(self.labelnames, key)), "value": value}
+                for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float("inf"),)
+        self._series: Dict[Tuple[str, ...], list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        if series is None:
+            # Per-bucket (non-cumulative) counts, then sum and count.
+            series = self._series[key] = [[0] * len(self.buckets), 0.0, 0]
+        for index, bound in enumerate(self.buckets):
+            if value <= bound:
+                series[0][index] += 1
+                break
+        series[1] += value
+        series[2] += 1
+
+    def quantile(self, q: float, **labels) -> Optional[float]:
+        key = tuple(str(labels.get(name, "")) for name in self.labelnames)
+        series = self._series.get(key)
+        return self._quantile(series, q) if series else None
+
+    def _quantile(self, series, q: float) -> float:
+        """Estimate a quantile by linear interpolation inside its bucket,
+        the same way Prometheus' histogram_quantile does."""
+        counts, _, total = series
+        rank = q * total
+        cumulative = 0
+        lower = 0.0
+        for bound, count in zip(self.buckets, counts):
+            if count and cumulative + count >= rank:
+                if bound == float("inf"):
+                    return lower
+                return lower + (bound - lower) * (rank - cumulative) / count
+            cumulative += count
+            if bound != float("inf"):
+                lower = bound
+        return lower
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total_sum, count) in sorted(self._series.items()):
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                le = f'le="{_format_number(bound)}"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, key, le)} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_number(total_sum)}")
+            lines.append(f"{self.name}_count{labels} {count}")
+        return lines
+
+    def snapshot(self) -> List[Dict]:
+        return [{
+            "labels": dict(zip(self.labelnames, key)),
+            "count": series[2],
+            "sum": series[1],
+            "p50": self._quantile(series, 0.50),
+            "p95": self._quantile(series, 0.95),
+            "p99": self._quantile(series, 0.99),
+        } for key, series in sorted(self._series.items())]
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        self._collectors: List[Callable[[], Dict[str, float]]] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector: Callable[[], Dict[str, float]]):
+        """Add a callback returning {gauge_name: value}, sampled on scrape."""
+        self._collectors.append(collector)
+
+    def _gauges(self) -> Dict[str, float]:
+        gauges = {}
+        for collector in self._collectors:
+            gauges.update(collector())
+        return gauges
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        for name, value in sorted(self._gauges().items()):
+            lines.append(f"# TYPE {name} gauge")
+            lines.append(f"{name} {_format_number(value)}")
+        return "\n".join(lines) + "\n"
+
+    def snapshot(self) -> Dict:
+        data = {metric.name: metric.snapshot() for metric in self._metrics}
+        data["gauges"] = self._gauges()
+        return data
+
+
+REGISTRY = Registry()
+
+HTTP_LATENCY = REGISTRY.histogram(
+    "medina_http_request_duration_seconds",
+    "Time from request start to the last response byte.",
+    ("method", "route", "status"))
+STAGE_LATENCY = REGISTRY.histogram(
+    "medina_stage_duration_seconds",
+    "Duration of one stage of request handling.",
+    ("stage", "operation"))
+MODEL_CALLS = REGISTRY.counter(
+    "medina_model_calls_total",
+    "Upstream model calls by OpenAIClient method and outcome.",
+    ("operation", "outcome"))
+MODEL_RETRIES = REGISTRY.counter(
+    "medina_model_retries_total",
+    "Retried upstream model requests.",
+    ("operation",))
+MODEL_TOKENS = REGISTRY.counter(
+    "medina_model_tokens_total",
+    "Tokens reported by the model, by method, profile and kind (prompt/completion).",
+    ("operation", "profile", "kind"))
+MODEL_STREAM_CHUNKS = REGISTRY.counter(
+    "medina_model_stream_chunks_total",
+    "Chunks received from streaming model calls.",
+    ("operation", "profile"))
+MODEL_COMPLETION_TOKENS = REGISTRY.histogram(
+    "medina_model_completion_tokens",
+    "Completion tokens per model call, for tuning profile token limits.",
+    ("operation", "profile"), TOKEN_BUCKETS)
+MODEL_TRUNCATED = REGISTRY.counter(
+    "medina_model_truncated_total",
+    "Model answers cut off by the profile's token limit.",
+    ("operation", "profile"))
+SHARED_STORE_ERRORS = REGISTRY.counter(
+    "medina_shared_store_errors_total",
+    "Shared store cache reads and writes that failed and were skipped.",
+    ("operation",))
+MODEL_PAYLOAD = REGISTRY.histogram(
+    "medina_model_payload_bytes",
+    "Approximate size of model request and response payloads.",
+    ("operation", "direction"), SIZE_BUCKETS)
+RATE_LIMIT_WAIT = REGISTRY.histogram(
+    "medina_rate_limit_wait_seconds",
+    "Time spent waiting for a shared rate limiter.",
+    ("limiter",))
+
+
+@contextmanager
+def span(stage: str, operation: str = ""):
+    """Time a block into medina_stage_duration_seconds."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - start
+        STAGE_LATENCY.observe(elapsed, stage=stage, operation=operation)
+        logger.debug("span", extra={"fields": {
+            "stage": stage, "operation": operation,
+            "duration_ms": round(elapsed * 1000, 2)}})
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording per-route latency until the response ends,
+    which for streaming responses includes the whole stream."""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            HTTP_LATENCY.observe(
+                time.perf_counter() - start, method=scope["method"],
+                route=getattr(route, "path", "unmatched"), status=status)
+
+
+class TextFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class JSONFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        payload = {
+            "ts": round(record.created, 3),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage(),
+        }
+        payload.update(getattr(record, "fields", {}))
+        if record.exc_info:
+            payload["exc"] = self.formatException(record.exc_info)
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+def setup_logging() -> logging.handlers.QueueListener:
+    """Route the "medina" logger through a queue so request handlers only
+    enqueue records; a listener thread does the formatting and I/O.
+
+    LOG_FORMAT=json switches to one JSON object per line.
+    """
+    handler = logging.StreamHandler()
+    if os.getenv("LOG_FORMAT", "text") == "json":
+        handler.setFormatter(JSONFormatter())
+    else:
+        handler.setFormatter(TextFormatter(
+            "%(asctime)s %(levelname)s %(name)s: %(message)s"))
+    log_queue = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(log_queue, handler)
+    logger.handlers = [logging.handlers.QueueHandler(log_queue)]
+    logger.setLevel(os.getenv("LOG_LEVEL", "INFO").upper())
+    logger.propagate = False
+    listener.start()
+    atexit.register(listener.stop)
+    return listener
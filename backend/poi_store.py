@@ -0,0 +1,201 @@
+import asyncio
+import json
+import os
+import sqlite3
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from geo import (
+    EARTH_RADIUS_M,
+    compass_direction,
+    format_distance,
+    format_walking_time,
+    geohash_cell_size,
+    geohash_encode,
+    geohash_neighbors,
+    haversine_m,
+)
+
+# Bounding box of Morocco, including the southern provinces.
+MOROCCO_BOUNDS = (20.5, 36.1, -17.3, -0.9)
+# Fields that describe a spot relative to one user and are recomputed per query.
+RELATIVE_FIELDS = ("distance", "walkingTime", "direction")
+
+
+class POIStore:
+    """Heritage spots learned from past model answers, queried locally.
+
+    Coordinates live in growable NumPy arrays, bucketed by geohash so a
+    query only looks at the 3x3 cells around the user. Distance, bearing
+    and walking time are computed with a vectorized haversine, so they are
+    exact rather than guessed by the model.
+    """
+
+    def __init__(self, db_path: str = None, precision: int = 5,
+                 radius_m: float = None, min_spots: int = None,
+                 max_spot_distance_m: float = None):
+        self.db_path = db_path or os.getenv("POI_STORE_PATH", "poi_store.db")
+        self.precision = precision
+        lat_size, lon_size = geohash_cell_size(precision)
+        # Neighbouring cells only cover one cell width around the user.
+        max_radius = min(lat_size, lon_size * np.cos(np.radians(36.1))) * 111_000
+        self.radius_m = min(radius_m or float(os.getenv("POI_RADIUS_M", "3000")), max_radius)
+        self.min_spots = min_spots or int(os.getenv("POI_MIN_SPOTS", "5"))
+        self.max_spot_distance_m = max_spot_distance_m or float(
+            os.getenv("POI_MAX_SPOT_DISTANCE_M", "20000"))
+        self._lat = np.empty(1024, dtype=np.float64)
+        self._lng = np.empty(1024, dtype=np.float64)
+        self._count = 0
+        self.spots: List[Dict] = []
+        self._buckets: Dict[str, List[int]] = {}
+        self.init_db()
+        self._load()
+
+    def init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS pois (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    name TEXT NOT NULL,
+                    lat REAL NOT NULL,
+                    lng REAL NOT NULL,
+                    payload TEXT NOT NULL
+                )
+            """)
+            # Workers learn the same spots; keep one row per name and place.
+            conn.execute("""
+                DELETE FROM pois WHERE id NOT IN (
+                    SELECT MIN(id) FROM pois
+                    GROUP BY lower(trim(name)), round(lat, 4), round(lng, 4)
+                )
+            """)
+            conn.execute("""
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_pois_name_position
+                ON pois (lower(trim(name)), round(lat, 4), round(lng, 4))
+            """)
+            conn.commit()
+
+    def _load(self):
+        with sqlite3.connect(self.db_path) as conn:
+            rows = conn.execute(
+                "SELECT lat, lng, payload FROM pois ORDER BY id").fetchall()
+        for lat, lng, payload in rows:
+            spot = json.loads(payload)
+            # Rows written by other workers may name the same spot a few
+            # metres apart, which the unique index does not catch.
+            if not self._is_duplicate(spot["name"], lat, lng):
+                self._append(lat, lng, spot)
+
+    def __len__(self):
+        return self._count
+
+    def _append(self, lat: float, lng: float, spot: Dict):
+        if self._count == len(self._lat):
+            self._lat = np.resize(self._lat, 2 * len(self._lat))
+            self._lng = np.resize(self._lng, 2 * len(self._lng))
+        index = self._count
+        self._lat[index] = lat
+        self._lng[index] = lng
+        self._count += 1
+        self.spots.append(spot)
+        self._buckets.setdefault(
+            geohash_encode(lat, lng, self.precision), []).append(index)
+
+    def _candidates(self, lat: float, lng: float) -> np.ndarray:
+        indices = []
+        for cell in geohash_neighbors(lat, lng, self.precision):
+            indices.extend(self._buckets.get(cell, ()))
+        return np.fromiter(indices, dtype=np.int64, count=len(indices))
+
+    def _validate(self, spot: Dict, origin_lat: float, origin_lng: float) -> Optional[tuple]:
+        name = spot.get("name")
+        coords = spot.get("coordinates") or {}
+        if not isinstance(name, str) or not name.strip():
+            return None
+        try:
+            lat, lng = float(coords["lat"]), float(coords["lng"])
+        except (KeyError, TypeError, ValueError):
+            return None
+        min_lat, max_lat, min_lng, max_lng = MOROCCO_BOUNDS
+        if not (min_lat <= lat <= max_lat and min_lng <= lng <= max_lng):
+            return None
+        if haversine_m(origin_lat, origin_lng, lat, lng) > self.max_spot_distance_m:
+            return None
+        return lat, lng
+
+    def _is_duplicate(self, name: str, lat: float, lng: float) -> bool:
+        key = name.strip().lower()
+        for index in self._candidates(lat, lng):
+            if haversine_m(lat, lng, self._lat[index], self._lng[index]) > 150:
+                continue
+            if self.spots[index]["name"].strip().lower() == key:
+                return True
+        return False
+
+    async def add_spots(self, spots: List[Dict], origin_lat: float, origin_lng: float) -> int:
+        """Keep spots whose coordinates are plausible for the request.
+
+        A spot must be in Morocco, within `max_spot_distance_m` of where it
+        was asked for, and not already stored under the same name nearby.
+        """
+        rows = []
+        for spot in spots:
+            position = self._validate(spot, origin_lat, origin_lng)
+            if position is None or self._is_duplicate(spot["name"], *position):
+                continue
+            stored = {k: v for k, v in spot.items() if k not in RELATIVE_FIELDS}
+            self._append(position[0], position[1], stored)
+            rows.append((stored["name"], position[0], position[1], json.dumps(stored)))
+
+        if rows:
+            def _save():
+                with sqlite3.connect(self.db_path) as conn:
+                    conn.executemany("""
+                        INSERT OR IGNORE INTO pois (name, lat, lng, payload)
+                        VALUES (?, ?, ?, ?)
+                    """, rows)
+                    conn.commit()
+
+            await asyncio.to_thread(_save)
+        return len(rows)
+
+    def nearest(self, lat: float, lng: float, k: int = 5) -> List[Dict]:
+        """The `k` closest spots within `radius_m`, nearest first, with
+        distance, walking time and direction from the given point."""
+        candidates = self._candidates(lat, lng)
+        if candidates.size == 0:
+            return []
+        phi1 = np.radians(lat)
+        phi2 = np.radians(self._lat[candidates])
+        dphi = phi2 - phi1
+        dlambda = np.radians(self._lng[candidates] - lng)
+        a = np.sin(dphi / 2) ** 2 + np.cos(phi1) * np.cos(phi2) * np.sin(dlambda / 2) ** 2
+        distances = 2 * EARTH_RADIUS_M * np.arcsin(np.sqrt(a))
+
+        within = np.flatnonzero(distances <= self.radius_m)
+        if within.size > k:
+            within = within[np.argpartition(distances[within], k)[:k]]
+        within = within[np.argsort(distances[within])]
+
+        x = np.sin(dlambda[within]) * np.cos(phi2[within])
+        y = np.cos(phi1) * np.sin(phi2[within]) - \
+            np.sin(phi1) * np.cos(phi2[within]) * np.cos(dlambda[within])
+        bearings = (np.degrees(np.arctan2(x, y)) + 360.0) % 360.0
+
+        results = []
+        for position, bearing in zip(within, bearings):
+            meters = float(distances[position])
+            spot = dict(self.spots[candidates[position]])
+            spot["distance"] = format_distance(meters)
+            spot["walkingTime"] = format_walking_time(meters)
+            spot["direction"] = compass_direction(float(bearing))
+            results.append(spot)
+        return results
+
+    def suggest(self, lat: float, lng: float, k: int = 5) -> Optional[Dict]:
+        """A full `/suggest-locations` response if the area is well covered."""
+        spots = self.nearest(lat, lng, k)
+        if len(spots) < min(k, self.min_spots):
+            return None
+        return {"spots": spots}
@@ -0,0 +1,168 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from geo import WALKING_SPEED_M_PER_MIN, bearing_deg, destination, haversine_m
+from metrics import logger
+
+
+class PrefetchScheduler:
+    """Warm caches for the tiles a walking user is about to reach.
+
+    Every reported position is appended to the user's trail. Once the trail
+    shows real movement, the heading from its oldest to its newest point is
+    extrapolated `lookahead_s` seconds at the measured speed (or walking
+    pace when the points carry no timestamps), and `warm(lat, lon)` runs in
+    the background for up to `max_tiles` tiles along that line which
+    `is_warm` reports as cold.
+
+    Prefetching is opportunistic: each user gets `user_budget` warm-ups per
+    `budget_window_s`, and at most `concurrency` run at once across all
+    users. Work beyond either limit is dropped, not queued, so it never
+    competes with requests a user is actually waiting on.
+    """
+
+    def __init__(self, warm: Callable[[float, float], Awaitable[None]],
+                 is_warm: Callable[[float, float], bool],
+                 tile: Callable[[float, float], str],
+                 lookahead_s: float = None, max_tiles: int = None,
+                 user_budget: int = None, budget_window_s: float = None,
+                 concurrency: int = None, max_users: int = None):
+        self.warm = warm
+        self.is_warm = is_warm
+        self.tile = tile
+        self.enabled = os.getenv("PREFETCH_ENABLED", "1") == "1"
+        self.lookahead_s = lookahead_s or float(
+            os.getenv("PREFETCH_LOOKAHEAD_S", "180"))
+        self.max_tiles = max_tiles or int(os.getenv("PREFETCH_MAX_TILES", "3"))
+        self.user_budget = user_budget or int(
+            os.getenv("PREFETCH_USER_BUDGET", "10"))
+        self.budget_window_s = budget_window_s or float(
+            os.getenv("PREFETCH_BUDGET_WINDOW_S", "600"))
+        self.concurrency = concurrency or int(
+            os.getenv("PREFETCH_CONCURRENCY", "4"))
+        self.max_users = max_users or int(os.getenv("PREFETCH_MAX_USERS", "10000"))
+        self.trail_size = 8
+        self.trail_max_age_s = 120.0
+        self.min_move_m = 15.0
+        self.max_speed_mps = 2.5
+        self._trails: "OrderedDict[int, deque]" = OrderedDict()
+        self._spent: Dict[int, deque] = {}
+        self._pending = set()
+        self._tasks = set()
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+        self.skipped_budget = 0
+        self.skipped_busy = 0
+
+    def observe(self, user_id: int, points: List[Tuple[float, float]],
+                now: float = None):
+        """Record positions, oldest first. Only the last is timestamped:
+        earlier ones come from a client-sent trail of unknown timing."""
+        if not self.enabled:
+            return
+        now = time.monotonic() if now is None else now
+        trail = self._trails.get(user_id)
+        if trail is None:
+            trail = self._trails[user_id] = deque(maxlen=self.trail_size)
+            while len(self._trails) > self.max_users:
+                evicted, _ = self._trails.popitem(last=False)
+                self._spent.pop(evicted, None)
+        self._trails.move_to_end(user_id)
+        if len(points) > 1:
+            trail.clear()
+            trail.extend((lat, lon, None) for lat, lon in points[:-1])
+        trail.append((*points[-1], now))
+        while trail[0][2] is not None and now - trail[0][2] > self.trail_max_age_s:
+            trail.popleft()
+
+        motion = self._motion(trail)
+        if motion is not None:
+            self._schedule(user_id, trail[-1][0], trail[-1][1], *motion, now)
+
+    def _motion(self, trail) -> Optional[Tuple[float, float]]:
+        """(bearing, speed in m/s) of the trail, or None when standing still."""
+        if len(trail) < 2:
+            return None
+        lat1, lon1, t1 = trail[0]
+        lat2, lon2, t2 = trail[-1]
+        distance = haversine_m(lat1, lon1, lat2, lon2)
+        if distance < self.min_move_m:
+            return None
+        if t1 is not None and t2 > t1:
+            speed = min(distance / (t2 - t1), self.max_speed_mps)
+        else:
+            speed = WALKING_SPEED_M_PER_MIN / 60
+        return bearing_deg(lat1, lon1, lat2, lon2), speed
+
+    def ahead(self, lat: float, lon: float, bearing: float,
+              speed: float) -> List[Tuple[float, float]]:
+        """Points in the distinct tiles along the projected path, nearest
+        first, excluding the tile the user is in."""
+        reach = speed * self.lookahead_s
+        step = max(reach / 12, 10.0)
+        seen = {self.tile(lat, lon)}
+        points = []
+        distance = step
+        while distance <= reach and len(points) < self.max_tiles:
+            point = destination(lat, lon, bearing, distance)
+            tile = self.tile(*point)
+            if tile not in seen:
+                seen.add(tile)
+                points.append(point)
+            distance += step
+        return points
+
+    def _schedule(self, user_id: int, lat: float, lon: float,
+                  bearing: float, speed: float, now: float):
+        spent = self._spent.setdefault(user_id, deque())
+        while spent and now - spent[0] > self.budget_window_s:
+            spent.popleft()
+        for point in self.ahead(lat, lon, bearing, speed):
+            tile = self.tile(*point)
+            if tile in self._pending or self.is_warm(*point):
+                continue
+            if len(spent) >= self.user_budget:
+                self.skipped_budget += 1
+                return
+            if len(self._tasks) >= self.concurrency:
+                self.skipped_busy += 1
+                return
+            spent.append(now)
+            self._pending.add(tile)
+            self.scheduled += 1
+            task = asyncio.create_task(self._run(tile, *point))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _run(self, tile: str, lat: float, lon: float):
+        try:
+            await self.warm(lat, lon)
+            self.completed += 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.failed += 1
+            logger.warning("Prefetch failed", extra={"fields": {
+                "tile": tile, "error": str(e)}})
+        finally:
+            self._pending.discard(tile)
+
+    async def close(self):
+        for task in list(self._tasks):
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    def stats(self) -> Dict:
+        return {
+            "users": len(self._trails),
+            "in_flight": len(self._tasks),
+            "scheduled": self.scheduled,
+            "completed": self.completed,
+            "failed": self.failed,
+            "skipped_budget": self.skipped_budget,
+            "skipped_busy": self.skipped_busy,
+        }
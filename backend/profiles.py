@@ -0,0 +1,65 @@
+import os
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+
+@dataclass(frozen=True)
+class Profile:
+    """Cost/latency tier for one model call.
+
+    `spot_fields` limits the spot schema sent with `/suggest-locations`
+    (None sends all of it); `image_detail` is passed to the vision model
+    (None leaves it to the API default); `compact_prompts` swaps the
+    system and user prompts for short ones.
+    """
+    name: str
+    chat_max_tokens: int
+    vision_max_tokens: int
+    image_detail: Optional[str]
+    spot_fields: Optional[Tuple[str, ...]]
+    compact_prompts: bool
+
+    @property
+    def complete(self) -> bool:
+        """Whether answers carry every field, so they may be shared
+        through the suggestion, POI and image caches."""
+        return self.spot_fields is None and not self.compact_prompts
+
+
+PROFILES = {
+    "fast": Profile("fast", chat_max_tokens=250, vision_max_tokens=200,
+                    image_detail="low",
+                    spot_fields=("name", "nameAr", "period", "description",
+                                 "coordinates"),
+                    compact_prompts=True),
+    "standard": Profile("standard", chat_max_tokens=800, vision_max_tokens=500,
+                        image_detail=None, spot_fields=None,
+                        compact_prompts=False),
+    "rich": Profile("rich", chat_max_tokens=1500, vision_max_tokens=1000,
+                    image_detail="high", spot_fields=None,
+                    compact_prompts=False),
+}
+
+# Default tier per route, overridable with PROFILE_<ROUTE>.
+ROUTE_DEFAULTS = {
+    "chat": "standard",
+    "chat_stream": "standard",
+    "suggest": "standard",
+    "image": "standard",
+    "guide": "fast",
+}
+
+
+def get_profile(name: str) -> Profile:
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(
+            f"Unknown profile: {name} (expected one of {', '.join(PROFILES)})")
+
+
+def route_profile(route: str, requested: Optional[str] = None) -> Profile:
+    """The profile a request asked for, else the route's configured default."""
+    if requested:
+        return get_profile(requested)
+    return get_profile(os.getenv(f"PROFILE_{route.upper()}", ROUTE_DEFAULTS[route]))
@@ -0,0 +1,220 @@
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Set
+
+import numpy as np
+
+from geo import geohash_encode
+
+MERSENNE_PRIME = (1 << 31) - 1
+SHINGLE_SIZE = 3
+STOPWORDS = {
+    "a", "an", "the", "is", "are", "was", "this", "that", "these", "those",
+    "of", "to", "in", "on", "at", "for", "me", "please", "can", "you",
+    "tell", "about", "here", "there", "i", "we", "my", "our",
+    "le", "la", "les", "de", "des", "du", "un", "une", "est",
+}
+# Words that flip a question's meaning while barely changing its shingles.
+NEGATIONS = {"not", "no", "non", "never", "without", "pas", "ne", "sans", "jamais"}
+# Trigram similarity at which two differing words count as one word
+# (plurals, typos); "open" and "close" share nothing.
+WORD_MATCH = 0.6
+
+
+def normalize(text: str) -> str:
+    """Lowercase, strip accents and punctuation, drop filler words."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(ch for ch in text if not unicodedata.combining(ch))
+    text = re.sub(r"['\u2019]s\b", "", text)
+    text = re.sub(r"n['\u2019]t\b", " not", text)
+    words = re.findall(r"\w+", text)
+    return " ".join(word for word in words if word not in STOPWORDS)
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[str]:
+    padded = f" {text} "
+    if len(padded) <= size:
+        return {padded}
+    return {padded[i:i + size] for i in range(len(padded) - size + 1)}
+
+
+def _jaccard(a: Set[str], b: Set[str]) -> float:
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+
+def same_meaning(a: str, b: str) -> bool:
+    """Whether two normalized questions use the same words, allowing for
+    plurals and typos. A negation on one side only, or a word with no
+    close counterpart on the other side, means a different question."""
+    words_a, words_b = set(a.split()), set(b.split())
+    if (words_a ^ words_b) & NEGATIONS:
+        return False
+    for word in words_a ^ words_b:
+        others = words_b if word in words_a else words_a
+        if not any(_jaccard(shingles(word), shingles(other)) >= WORD_MATCH
+                   for other in others):
+            return False
+    return True
+
+
+@dataclass
+class _Entry:
+    tile: str
+    normalized: str
+    signature: np.ndarray
+    response: str
+    created_at: float
+    size: int
+    hits: int = 0
+    band_keys: List[bytes] = field(default_factory=list)
+
+
+class SemanticCache:
+    """Answers to near-identical questions asked from the same area.
+
+    Questions are normalized and reduced to a MinHash signature over
+    character trigrams. Signatures are indexed with LSH banding inside a
+    per-tile partition, so a lookup compares only against questions that
+    share a band in the same tile, and accepts the closest one whose
+    estimated Jaccard similarity clears the threshold and which uses the
+    same words (see `same_meaning`). Questions with
+    fewer than SHINGLE_SIZE characters left after normalization ("tell me
+    about this") say nothing on their own and are never cached.
+    """
+
+    def __init__(self, num_perm: int = 64, bands: int = 16,
+                 threshold: float = None, ttl_seconds: float = None,
+                 max_entries: int = None, max_bytes: int = None,
+                 precision: int = None, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold or float(
+            os.getenv("SEMANTIC_CACHE_THRESHOLD", "0.9"))
+        self.ttl_seconds = ttl_seconds or float(
+            os.getenv("SEMANTIC_CACHE_TTL", str(6 * 3600)))
+        self.max_entries = max_entries or int(
+            os.getenv("SEMANTIC_CACHE_MAX_ENTRIES", "5000"))
+        self.max_bytes = max_bytes or int(
+            os.getenv("SEMANTIC_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+        self.precision = precision or int(
+            os.getenv("SEMANTIC_CACHE_PRECISION", "6"))
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.int64)
+        self._b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.int64)
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._index: Dict[str, Dict[bytes, Set[int]]] = {}
+        self._next_id = 0
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.skipped = 0
+
+    def tile(self, lat: float, lon: float) -> str:
+        return geohash_encode(lat, lon, self.precision)
+
+    def signature(self, normalized: str) -> np.ndarray:
+        hashes = np.fromiter(
+            (int.from_bytes(hashlib.blake2b(s.encode(), digest_size=4).digest(), "little")
+             for s in shingles(normalized)),
+            dtype=np.int64)
+        # Reduce first so a * h stays below 2^62 and cannot wrap in int64.
+        hashes %= MERSENNE_PRIME
+        permuted = (self._a[:, None] * hashes[None, :] + self._b[:, None]) % MERSENNE_PRIME
+        return permuted.min(axis=1)
+
+    def _band_keys(self, signature: np.ndarray) -> List[bytes]:
+        return [bytes([band]) + signature[band * self.rows:(band + 1) * self.rows].tobytes()
+                for band in range(self.bands)]
+
+    def get(self, tile: str, message: str) -> Optional[str]:
+        normalized = normalize(message)
+        if len(normalized) < SHINGLE_SIZE:
+            self.skipped += 1
+            return None
+        signature = self.signature(normalized)
+        partition = self._index.get(tile, {})
+        now = time.time()
+        best, best_score = None, self.threshold
+        expired = []
+        for key in self._band_keys(signature):
+            for entry_id in partition.get(key, ()):
+                entry = self._entries[entry_id]
+                if now - entry.created_at > self.ttl_seconds:
+                    expired.append(entry_id)
+                    continue
+                if entry.normalized == normalized:
+                    score = 1.0
+                elif same_meaning(entry.normalized, normalized):
+                    score = float(np.mean(entry.signature == signature))
+                else:
+                    continue
+                if score >= best_score:
+                    best, best_score = entry_id, score
+        for entry_id in set(expired):
+            self._remove(entry_id)
+        if best is None or best not in self._entries:
+            self.misses += 1
+            return None
+        entry = self._entries[best]
+        entry.hits += 1
+        self._entries.move_to_end(best)
+        self.hits += 1
+        return entry.response
+
+    def put(self, tile: str, message: str, response: str):
+        normalized = normalize(message)
+        if len(normalized) < SHINGLE_SIZE:
+            return
+        signature = self.signature(normalized)
+        entry = _Entry(tile, normalized, signature, response, time.time(),
+                       len(response.encode("utf-8")) + signature.nbytes)
+        entry.band_keys = self._band_keys(signature)
+        entry_id = self._next_id
+        self._next_id += 1
+        self._entries[entry_id] = entry
+        self._bytes += entry.size
+        partition = self._index.setdefault(tile, {})
+        for key in entry.band_keys:
+            partition.setdefault(key, set()).add(entry_id)
+        while self._entries and (len(self._entries) > self.max_entries
+                                 or self._bytes > self.max_bytes):
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, entry_id: int):
+        entry = self._entries.pop(entry_id, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        partition = self._index.get(entry.tile, {})
+        for key in entry.band_keys:
+            bucket = partition.get(key)
+            if bucket is not None:
+                bucket.discard(entry_id)
+                if not bucket:
+                    del partition[key]
+        if not partition:
+            self._index.pop(entry.tile, None)
+
+    def stats(self, top: int = 10) -> Dict:
+        total = self.hits + self.misses
+        popular = sorted(self._entries.values(), key=lambda e: e.hits, reverse=True)[:top]
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "skipped": self.skipped,
+            "hit_rate": self.hits / total if total else 0.0,
+            "top_entries": [
+                {"tile": e.tile, "question": e.normalized, "hits": e.hits}
+                for e in popular if e.hits
+            ],
+        }
@@ -0,0 +1,35 @@
+"""Run the API in several worker processes.
+
+Workers share the Azure OpenAI quota, the Nominatim rate limit and the
+suggestion and geocode caches through SHARED_STORE, which defaults to a
+SQLite file here when more than one worker is started. Set
+SHARED_STORE=redis and SHARED_STORE_URL to spread workers over hosts.
+
+    python serve.py --workers 4 --port 8000
+"""
+import argparse
+import os
+
+import uvicorn
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int,
+                        default=int(os.getenv("WEB_CONCURRENCY", os.cpu_count() or 1)))
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+
+    if args.workers > 1:
+        # Per-process state would give every worker its own copy of the
+        # quota and caches.
+        os.environ.setdefault("SHARED_STORE", "sqlite")
+    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+    uvicorn.run("main:app", host=args.host, port=args.port,
+                workers=args.workers, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
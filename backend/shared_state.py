@@ -0,0 +1,244 @@
+import asyncio
+import os
+import random
+import time
+from typing import Dict, Optional, Tuple
+
+from metrics import RATE_LIMIT_WAIT, SHARED_STORE_ERRORS, logger
+from storage import SQLiteEngine
+
+# Expired cache entries are deleted at most this often.
+PURGE_INTERVAL_S = 300.0
+
+
+def _refill(tokens: float, updated: float, now: float, rate: float,
+            capacity: float, cost: float) -> Tuple[float, float]:
+    """Token-bucket step: returns (tokens left, seconds to wait). Nothing is
+    taken when the caller has to wait."""
+    tokens = min(capacity, tokens + max(0.0, now - updated) * rate)
+    if tokens >= cost:
+        return tokens - cost, 0.0
+    return tokens, (cost - tokens) / rate
+
+
+class LocalStore:
+    """In-process store: the default for a single worker."""
+
+    def __init__(self):
+        self._values: Dict[str, Tuple[str, float]] = {}
+        self._buckets: Dict[str, Tuple[float, float]] = {}
+        self._purged_at = time.monotonic()
+
+    async def get(self, key: str) -> Optional[str]:
+        entry = self._values.get(key)
+        if entry is None or entry[1] < time.time():
+            self._values.pop(key, None)
+            return None
+        return entry[0]
+
+    async def set(self, key: str, value: str, ttl: float):
+        self._values[key] = (value, time.time() + ttl)
+        if time.monotonic() - self._purged_at > PURGE_INTERVAL_S:
+            now = time.time()
+            self._values = {k: v for k, v in self._values.items() if v[1] >= now}
+            self._purged_at = time.monotonic()
+
+    async def take(self, bucket: str, cost: float, rate: float, capacity: float) -> float:
+        now = time.time()
+        tokens, updated = self._buckets.get(bucket, (capacity, now))
+        tokens, wait = _refill(tokens, updated, now, rate, capacity, cost)
+        self._buckets[bucket] = (tokens, now)
+        return wait
+
+    async def close(self):
+        pass
+
+
+class SQLiteStore:
+    """Store shared by every worker on one host through a WAL SQLite file.
+
+    Bucket updates run in an immediate transaction, so concurrent workers
+    see each other's withdrawals.
+    """
+
+    def __init__(self, db_path: str = None):
+        self.db_path = db_path or os.getenv("SHARED_STORE_PATH", "shared_state.db")
+        self.engine = SQLiteEngine(self.db_path, readers=2)
+        self._ready = False
+        self._purged_at = 0.0
+
+    async def _init(self):
+        if self._ready:
+            return
+
+        def _create(conn):
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS kv (
+                    key TEXT PRIMARY KEY,
+                    value TEXT NOT NULL,
+                    expires_at REAL NOT NULL
+                )
+            """)
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS buckets (
+                    name TEXT PRIMARY KEY,
+                    tokens REAL NOT NULL,
+                    updated REAL NOT NULL
+                )
+            """)
+
+        await self.engine.write(_create)
+        self._ready = True
+        await self._purge()
+
+    async def _purge(self):
+        """Delete expired entries; reads already skip them, but without
+        this every geocode miss and tile would stay in the file for good."""
+        self._purged_at = time.monotonic()
+
+        def _delete(conn):
+            conn.execute("DELETE FROM kv WHERE expires_at < ?", (time.time(),))
+
+        await self.engine.write(_delete)
+
+    async def get(self, key: str) -> Optional[str]:
+        await self._init()
+
+        def _get(conn):
+            row = conn.execute(
+                "SELECT value FROM kv WHERE key = ? AND expires_at >= ?",
+                (key, time.time())).fetchone()
+            return row[0] if row else None
+
+        return await self.engine.read(_get)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self._init()
+
+        def _set(conn):
+            conn.execute(
+                "INSERT OR REPLACE INTO kv (key, value, expires_at) VALUES (?, ?, ?)",
+                (key, value, time.time() + ttl))
+
+        await self.engine.write(_set)
+        if time.monotonic() - self._purged_at > PURGE_INTERVAL_S:
+            await self._purge()
+
+    async def take(self, bucket: str, cost: float, rate: float, capacity: float) -> float:
+        await self._init()
+
+        def _take(conn):
+            now = time.time()
+            row = conn.execute(
+                "SELECT tokens, updated FROM buckets WHERE name = ?", (bucket,)).fetchone()
+            tokens, updated = row if row else (capacity, now)
+            tokens, wait = _refill(tokens, updated, now, rate, capacity, cost)
+            conn.execute(
+                "INSERT OR REPLACE INTO buckets (name, tokens, updated) VALUES (?, ?, ?)",
+                (bucket, tokens, now))
+            return wait
+
+        return await self.engine.write(_take)
+
+    async def close(self):
+        self.engine.close()
+
+
+# KEYS[1] bucket; ARGV rate, capacity, cost, now. Returns the wait in seconds.
+_TAKE_SCRIPT = """
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated')
+local rate, capacity = tonumber(ARGV[1]), tonumber(ARGV[2])
+local cost, now = tonumber(ARGV[3]), tonumber(ARGV[4])
+local tokens = tonumber(state[1]) or capacity
+local updated = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if tokens >= cost then tokens = tokens - cost else wait = (cost - tokens) / rate end
+redis.call('HSET', KEYS[1], 'tokens', tokens, 'updated', now)
+redis.call('EXPIRE', KEYS[1], math.ceil(capacity / rate) + 60)
+return tostring(wait)
+"""
+
+
+class RedisStore:
+    """Store on a Redis-compatible server, for workers on several hosts."""
+
+    def __init__(self, url: str = None):
+        import redis.asyncio as redis
+
+        self.url = url or os.getenv("SHARED_STORE_URL", "redis://localhost:6379/0")
+        self.client = redis.from_url(self.url, decode_responses=True)
+        self._take = self.client.register_script(_TAKE_SCRIPT)
+
+    async def get(self, key: str) -> Optional[str]:
+        return await self.client.get(key)
+
+    async def set(self, key: str, value: str, ttl: float):
+        await self.client.set(key, value, px=int(ttl * 1000))
+
+    async def take(self, bucket: str, cost: float, rate: float, capacity: float) -> float:
+        wait = await self._take(keys=[bucket], args=[rate, capacity, cost, time.time()])
+        return float(wait)
+
+    async def close(self):
+        await self.client.aclose()
+
+
+async def cache_get(store, key: str) -> Optional[str]:
+    """`store.get` for caches: an unreachable store reads as a miss."""
+    try:
+        return await store.get(key)
+    except Exception as e:
+        SHARED_STORE_ERRORS.inc(operation="get")
+        logger.warning("Shared store read failed", extra={"fields": {
+            "key": key, "error": str(e)}})
+        return None
+
+
+async def cache_set(store, key: str, value: str, ttl: float):
+    """`store.set` for caches: a failed write is logged and skipped."""
+    try:
+        await store.set(key, value, ttl)
+    except Exception as e:
+        SHARED_STORE_ERRORS.inc(operation="set")
+        logger.warning("Shared store write failed", extra={"fields": {
+            "key": key, "error": str(e)}})
+
+
+def shared_store_from_env():
+    """SHARED_STORE=local (default), sqlite or redis."""
+    backend = os.getenv("SHARED_STORE", "local")
+    if backend == "sqlite":
+        return SQLiteStore()
+    if backend == "redis":
+        return RedisStore()
+    if backend != "local":
+        raise ValueError(f"Unknown SHARED_STORE: {backend}")
+    return LocalStore()
+
+
+class RateLimiter:
+    """Token bucket refilled at `per_minute`, shared through `store` by
+    every worker using the same `name`. A rate of 0 disables it."""
+
+    def __init__(self, store, name: str, per_minute: float, burst: float = None):
+        self.store = store
+        self.name = name
+        self.rate = per_minute / 60
+        self.capacity = burst or per_minute
+        self.waits = 0
+
+    async def acquire(self, cost: float = 1.0):
+        if self.rate <= 0:
+            return
+        # A request bigger than the bucket could never be admitted.
+        cost = min(cost, self.capacity)
+        start = time.perf_counter()
+        while True:
+            wait = await self.store.take(self.name, cost, self.rate, self.capacity)
+            if wait <= 0:
+                break
+            self.waits += 1
+            # Jitter so workers woken together do not collide again.
+            await asyncio.sleep(wait + random.uniform(0, min(wait, 0.1)))
+        RATE_LIMIT_WAIT.observe(time.perf_counter() - start, limiter=self.name)
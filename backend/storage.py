@@ -0,0 +1,89 @@
+import asyncio
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, TypeVar
+
+from metrics import span
+
+T = TypeVar("T")
+
+
+class SQLiteEngine:
+    """Long-lived SQLite connections in WAL mode.
+
+    Reads run on a small thread pool where every thread owns one
+    connection; writes are serialized through a single writer thread with
+    its own connection. Under WAL, readers see the last committed snapshot
+    and never wait for the writer. Each connection keeps its own compiled
+    statement cache, so repeating the same SQL text skips re-preparing it.
+    """
+
+    def __init__(self, db_path: str, readers: int = None,
+                 mmap_size: int = None, cache_size_kb: int = None):
+        self.db_path = db_path
+        self.readers = readers or int(os.getenv("SQLITE_READERS", "4"))
+        self.mmap_size = mmap_size or int(
+            os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+        self.cache_size_kb = cache_size_kb or int(
+            os.getenv("SQLITE_CACHE_SIZE_KB", str(16 * 1024)))
+        self.busy_timeout_ms = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+        self._read_executor = ThreadPoolExecutor(
+            max_workers=self.readers, thread_name_prefix="sqlite-reader",
+            initializer=self._open_thread_connection)
+        self._write_executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="sqlite-writer",
+            initializer=self._open_thread_connection)
+
+    def connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path, check_same_thread=False, cached_statements=256)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(f"PRAGMA busy_timeout={self.busy_timeout_ms}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA mmap_size={self.mmap_size}")
+        conn.execute(f"PRAGMA cache_size=-{self.cache_size_kb}")
+        return conn
+
+    def _open_thread_connection(self):
+        conn = self.connect()
+        self._local.conn = conn
+        with self._lock:
+            self._connections.append(conn)
+
+    def _run_read(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        return fn(self._local.conn)
+
+    def _run_write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        conn = self._local.conn
+        with conn:
+            # Take the write lock up front. With several processes on one
+            # file, a deferred transaction that reads before it writes gets
+            # SQLITE_BUSY at the upgrade instead of waiting out busy_timeout.
+            conn.execute("BEGIN IMMEDIATE")
+            return fn(conn)
+
+    async def read(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        loop = asyncio.get_running_loop()
+        with span("db_read"):
+            return await loop.run_in_executor(self._read_executor, self._run_read, fn)
+
+    async def write(self, fn: Callable[[sqlite3.Connection], T]) -> T:
+        """Run `fn` in a transaction on the writer thread."""
+        loop = asyncio.get_running_loop()
+        with span("db_write"):
+            return await loop.run_in_executor(self._write_executor, self._run_write, fn)
+
+    def close(self):
+        self._read_executor.shutdown(wait=True)
+        self._write_executor.shutdown(wait=True)
+        with self._lock:
+            for conn in self._connections:
+                conn.close()
+            self._connections.clear()
@@ -0,0 +1,91 @@
+import json
+from typing import Dict, List, Optional
+
+JSON_TYPES = {
+    "string": str,
+    "number": (int, float),
+    "integer": int,
+    "boolean": bool,
+    "array": list,
+    "object": dict,
+}
+
+
+class ArrayItemParser:
+    """Incrementally extract the items of one top-level array field.
+
+    Feed it the JSON text of an object like ``{"spots": [{...}, {...}]}`` in
+    arbitrary pieces; every time an item object of ``field`` closes, it is
+    decoded and returned. Only the text of the item currently being read is
+    buffered, so memory does not grow with the length of the document.
+    """
+
+    def __init__(self, field: str):
+        self.field = field
+        self._stack: List[str] = []
+        self._in_string = False
+        self._escape = False
+        self._string: List[str] = []
+        self._last_key: Optional[str] = None
+        self._array_key: Optional[str] = None
+        self._item: Optional[List[str]] = None
+
+    def feed(self, text: str) -> List[Dict]:
+        items = []
+        for ch in text:
+            if self._item is not None:
+                self._item.append(ch)
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if len(self._stack) == 1:
+                        self._last_key = "".join(self._string)
+                else:
+                    if len(self._stack) == 1:
+                        self._string.append(ch)
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string = []
+            elif ch in "{[":
+                if ch == "[" and len(self._stack) == 1:
+                    self._array_key = self._last_key
+                if ch == "{" and self._in_field_array():
+                    self._item = ["{"]
+                self._stack.append(ch)
+            elif ch in "}]":
+                if self._stack:
+                    self._stack.pop()
+                if ch == "}" and self._item is not None and self._in_field_array():
+                    items.append(json.loads("".join(self._item)))
+                    self._item = None
+        return items
+
+    def _in_field_array(self) -> bool:
+        return self._stack == ["{", "["] and self._array_key == self.field
+
+
+def validate(value, schema: Dict) -> bool:
+    """Check `value` against the subset of JSON Schema used by the tool
+    definitions: `type`, `properties`, `required` and array `items`."""
+    expected = JSON_TYPES.get(schema.get("type"))
+    if expected is not None:
+        if not isinstance(value, expected):
+            return False
+        if schema.get("type") == "number" and isinstance(value, bool):
+            return False
+    if isinstance(value, dict):
+        if any(key not in value for key in schema.get("required", ())):
+            return False
+        for key, sub_schema in schema.get("properties", {}).items():
+            if key in value and not validate(value[key], sub_schema):
+                return False
+    if isinstance(value, list) and "items" in schema:
+        return all(validate(item, schema["items"]) for item in value)
+    return True
@@ -0,0 +1,186 @@
+import sqlite3
+import asyncio
+import json
+import os
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional
+
+from geo import (
+    bearing_deg,
+    compass_direction,
+    format_distance,
+    format_walking_time,
+    geohash_encode,
+    haversine_m,
+)
+from shared_state import cache_get, cache_set
+
+
+class SuggestionCache:
+    """LRU + TTL cache of `/suggest-locations` responses keyed by geohash tile.
+
+    Entries live in memory for sub-millisecond hits and are written through to
+    a local SQLite file so a restart does not cold-start every tile.
+    """
+
+    def __init__(self, db_path: str = None, precision: int = None,
+                 ttl_seconds: float = None, max_entries: int = None,
+                 max_radius_m: float = None, store=None):
+        self.db_path = db_path or os.getenv(
+            "SUGGESTION_CACHE_PATH", "suggestion_cache.db")
+        self.precision = precision or int(
+            os.getenv("SUGGESTION_CACHE_PRECISION", "7"))
+        self.ttl_seconds = ttl_seconds or float(
+            os.getenv("SUGGESTION_CACHE_TTL", str(24 * 3600)))
+        self.max_entries = max_entries or int(
+            os.getenv("SUGGESTION_CACHE_MAX_ENTRIES", "10000"))
+        self.max_radius_m = max_radius_m or float(
+            os.getenv("SUGGESTION_CACHE_RADIUS_M", "10000"))
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        # Shared with other workers; None when this process is the only one.
+        self.store = store
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.init_db()
+        self._load()
+
+    def init_db(self):
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS suggestions (
+                    tile TEXT PRIMARY KEY,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL
+                )
+            """)
+            conn.commit()
+
+    def _load(self):
+        cutoff = time.time() - self.ttl_seconds
+        with sqlite3.connect(self.db_path) as conn:
+            conn.execute(
+                "DELETE FROM suggestions WHERE created_at < ?", (cutoff,))
+            rows = conn.execute("""
+                SELECT tile, payload, created_at FROM suggestions
+                ORDER BY created_at DESC LIMIT ?
+            """, (self.max_entries,)).fetchall()
+            conn.commit()
+        for tile, payload, created_at in reversed(rows):
+            self._entries[tile] = (json.loads(payload), created_at)
+
+    def tile(self, lat: float, lon: float) -> str:
+        return geohash_encode(lat, lon, self.precision)
+
+    def get(self, lat: float, lon: float) -> Optional[Dict]:
+        tile = self.tile(lat, lon)
+        entry = self._entries.get(tile)
+        if entry is None or time.time() - entry[1] > self.ttl_seconds:
+            if entry is not None:
+                del self._entries[tile]
+            self.misses += 1
+            return None
+        self._entries.move_to_end(tile)
+        self.hits += 1
+        return self.rank(entry[0], lat, lon)
+
+    async def fetch(self, lat: float, lon: float) -> Optional[Dict]:
+        """`get`, falling back to tiles other workers have cached."""
+        cached = self.get(lat, lon)
+        if cached is not None or self.store is None:
+            return cached
+        response = await self._load_shared(self.tile(lat, lon))
+        if response is None:
+            return None
+        self.shared_hits += 1
+        return self.rank(response, lat, lon)
+
+    async def _load_shared(self, tile: str) -> Optional[Dict]:
+        """Copy a tile another worker cached into this one."""
+        payload = await cache_get(self.store, f"suggest:{tile}")
+        if payload is None:
+            return None
+        created_at, response = json.loads(payload)
+        self._insert(tile, response, created_at)
+        return response
+
+    def contains(self, lat: float, lon: float) -> bool:
+        """Whether the tile holds a fresh entry; leaves recency and hit
+        counts alone, unlike `get`."""
+        entry = self._entries.get(self.tile(lat, lon))
+        return entry is not None and time.time() - entry[1] <= self.ttl_seconds
+
+    async def contains_shared(self, lat: float, lon: float) -> bool:
+        """`contains`, also looking in the shared store."""
+        if self.contains(lat, lon):
+            return True
+        return (self.store is not None
+                and await self._load_shared(self.tile(lat, lon)) is not None)
+
+    def _insert(self, tile: str, response: Dict, created_at: float) -> List[str]:
+        self._entries[tile] = (response, created_at)
+        self._entries.move_to_end(tile)
+        evicted = []
+        while len(self._entries) > self.max_entries:
+            evicted.append(self._entries.popitem(last=False)[0])
+        return evicted
+
+    async def put(self, lat: float, lon: float, response: Dict):
+        tile = self.tile(lat, lon)
+        created_at = time.time()
+        evicted = self._insert(tile, response, created_at)
+
+        payload = json.dumps(response)
+        if self.store is not None:
+            await cache_set(self.store, f"suggest:{tile}",
+                            json.dumps([created_at, response]), self.ttl_seconds)
+
+        def _save():
+            with sqlite3.connect(self.db_path) as conn:
+                conn.execute("""
+                    INSERT OR REPLACE INTO suggestions (tile, payload, created_at)
+                    VALUES (?, ?, ?)
+                """, (tile, payload, created_at))
+                if evicted:
+                    conn.executemany(
+                        "DELETE FROM suggestions WHERE tile = ?",
+                        [(t,) for t in evicted])
+                conn.commit()
+
+        await asyncio.to_thread(_save)
+
+    def rank(self, response: Dict, lat: float, lon: float) -> Dict:
+        """Re-derive position-relative fields from the exact requested point,
+        drop spots beyond the radius and sort nearest first."""
+        ranked = []
+        unplaced = []
+        for spot in response.get("spots", []):
+            coords = spot.get("coordinates") or {}
+            try:
+                spot_lat, spot_lon = float(coords["lat"]), float(coords["lng"])
+            except (KeyError, TypeError, ValueError):
+                unplaced.append(spot)
+                continue
+            meters = haversine_m(lat, lon, spot_lat, spot_lon)
+            if meters > self.max_radius_m:
+                continue
+            spot = dict(spot)
+            spot["distance"] = format_distance(meters)
+            spot["walkingTime"] = format_walking_time(meters)
+            spot["direction"] = compass_direction(
+                bearing_deg(lat, lon, spot_lat, spot_lon))
+            ranked.append((meters, spot))
+        ranked.sort(key=lambda item: item[0])
+        return {**response, "spots": [spot for _, spot in ranked] + unplaced}
+
+    def stats(self) -> Dict:
+        total = self.hits + self.misses
+        served = self.hits + self.shared_hits
+        return {
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "shared_hits": self.shared_hits,
+            "hit_rate": served / total if total else 0.0,
+        }
@@ -0,0 +1,72 @@
+import asyncio
+import base64
+import json
+
+import pytest
+
+from database import DatabaseManager, decode_cursor, encode_cursor
+
+
+def b64(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def test_round_trip():
+    row = {"timestamp": "2026-01-02 03:04:05", "id": 123}
+    cursor = encode_cursor(row)
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == ("2026-01-02 03:04:05", 123)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    "é",
+    "abc",
+    b64(b"\xff\xfe"),
+    b64(b"{not json"),
+    b64(json.dumps("2026-01-02").encode()),
+    b64(json.dumps(7).encode()),
+    b64(json.dumps(["2026-01-02"]).encode()),
+    b64(json.dumps(["2026-01-02", 1, 2]).encode()),
+    b64(json.dumps(["2026-01-02", "seven"]).encode()),
+    b64(json.dumps(["2026-01-02", None]).encode()),
+    b64(json.dumps({"timestamp": "2026-01-02", "id": 1}).encode()),
+])
+def test_tampered_cursor_is_rejected(cursor):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(cursor)
+
+
+def test_pages_cover_every_message_once(tmp_path):
+    async def scenario():
+        db = DatabaseManager(str(tmp_path / "messages.db"))
+        try:
+            # Writes go through until start(); many share one timestamp,
+            # so the id has to break ties.
+            for i in range(7):
+                await db.save_message(1, f"q{i}", f"a{i}")
+            await db.save_message(2, "other", "user")
+            pages, cursor = [], None
+            while True:
+                rows, cursor = await db.get_messages_page(1, limit=3, cursor=cursor)
+                pages.append([row["user_message"] for row in rows])
+                if cursor is None:
+                    return pages
+        finally:
+            await db.close()
+
+    pages = asyncio.run(scenario())
+    assert pages == [["q6", "q5", "q4"], ["q3", "q2", "q1"], ["q0"]]
+
+
+def test_page_limit_is_bounded(tmp_path):
+    async def scenario(limit):
+        db = DatabaseManager(str(tmp_path / "messages.db"))
+        try:
+            await db.get_messages_page(1, limit=limit)
+        finally:
+            await db.close()
+
+    for limit in (0, -1, 501):
+        with pytest.raises(ValueError):
+            asyncio.run(scenario(limit))
@@ -0,0 +1,145 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight, coalesce
+
+
+def test_concurrent_calls_share_one_execution():
+    async def scenario():
+        flight = SingleFlight()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            await asyncio.sleep(0.01)
+            return "done"
+
+        results = await asyncio.gather(*(flight.do("k", work) for _ in range(5)))
+        return flight, calls, results
+
+    flight, calls, results = asyncio.run(scenario())
+    assert calls == 1
+    assert results == ["done"] * 5
+    assert flight.stats() == {"in_flight": 0, "executions": 1, "coalesced": 4}
+
+
+def test_cancelled_waiter_does_not_cancel_the_others():
+    async def scenario():
+        flight = SingleFlight()
+        release = asyncio.Event()
+
+        async def work():
+            await release.wait()
+            return 42
+
+        waiters = [asyncio.create_task(flight.do("k", work)) for _ in range(3)]
+        await asyncio.sleep(0)
+        waiters[0].cancel()
+        await asyncio.sleep(0)
+        release.set()
+        return await asyncio.gather(*waiters, return_exceptions=True)
+
+    first, *rest = asyncio.run(scenario())
+    assert isinstance(first, asyncio.CancelledError)
+    assert rest == [42, 42]
+
+
+def test_work_is_cancelled_when_every_waiter_leaves():
+    async def scenario():
+        flight = SingleFlight()
+        started = asyncio.Event()
+        cancelled = asyncio.Event()
+        calls = 0
+
+        async def work():
+            nonlocal calls
+            calls += 1
+            started.set()
+            try:
+                await asyncio.sleep(10)
+            except asyncio.CancelledError:
+                cancelled.set()
+                raise
+            return "stale"
+
+        waiters = [asyncio.create_task(flight.do("k", work)) for _ in range(3)]
+        await started.wait()
+        for waiter in waiters:
+            waiter.cancel()
+        await asyncio.gather(*waiters, return_exceptions=True)
+        await asyncio.wait_for(cancelled.wait(), 1)
+
+        async def fresh():
+            nonlocal calls
+            calls += 1
+            return "fresh"
+
+        # A new call after abandonment must not join the cancelled work.
+        return await flight.do("k", fresh), calls, flight.stats()
+
+    result, calls, stats = asyncio.run(scenario())
+    assert result == "fresh"
+    assert calls == 2
+    assert stats["in_flight"] == 0
+
+
+def test_exception_reaches_every_waiter():
+    async def scenario():
+        flight = SingleFlight()
+
+        async def work():
+            await asyncio.sleep(0.01)
+            raise RuntimeError("boom")
+
+        return await asyncio.gather(
+            *(flight.do("k", work) for _ in range(3)), return_exceptions=True)
+
+    results = asyncio.run(scenario())
+    assert len(results) == 3
+    assert all(isinstance(r, RuntimeError) and str(r) == "boom" for r in results)
+
+
+def test_coalesce_keys_on_bound_arguments():
+    class Service:
+        def __init__(self):
+            self.single_flight = SingleFlight()
+            self.calls = 0
+
+        @coalesce
+        async def lookup(self, lat, lng, radius=500, tags=None):
+            self.calls += 1
+            await asyncio.sleep(0.01)
+            return lat, lng, radius
+
+    async def scenario():
+        service = Service()
+        await asyncio.gather(
+            service.lookup(31.6, -8.0),
+            service.lookup(31.6, -8.0, 500),
+            service.lookup(lat=31.6, lng=-8.0, radius=500, tags=None),
+        )
+        first = service.calls
+        await asyncio.gather(
+            service.lookup(31.6, -8.0, tags=["museum"]),
+            service.lookup(31.6, -8.0, tags=["museum"]),
+            service.lookup(31.6, -8.0, radius=800),
+        )
+        return first, service.calls
+
+    first, total = asyncio.run(scenario())
+    assert first == 1
+    assert total == 3
+
+
+def test_coalesce_rejects_arguments_the_method_does_not_take():
+    class Service:
+        single_flight = SingleFlight()
+
+        @coalesce
+        async def lookup(self, lat, lng):
+            return lat, lng
+
+    with pytest.raises(TypeError):
+        asyncio.run(Service().lookup(1, 2, 3))
@@ -0,0 +1,66 @@
+import json
+
+import pytest
+
+from stream_json import ArrayItemParser, validate
+
+SPOTS = [
+    {"name": "Koutoubia", "description": "The \"minaret\" [12th c.] {Almohad}"},
+    {"name": "Back\\slash \\\" and \\\\", "tags": ["a]", "{b", "c\\"], "nested": {"x": [1, {"y": 2}]}},
+    {"name": "Unicode é \\u00e9 🕌"},
+]
+DOCUMENT = json.dumps({"intro": "see [below] {ok}", "spots": SPOTS, "outro": {"spots": [{"no": 1}]}})
+
+
+def feed_all(parser, chunks):
+    items = []
+    for chunk in chunks:
+        items.extend(parser.feed(chunk))
+    return items
+
+
+def test_whole_document():
+    assert feed_all(ArrayItemParser("spots"), [DOCUMENT]) == SPOTS
+
+
+def test_one_character_at_a_time():
+    assert feed_all(ArrayItemParser("spots"), DOCUMENT) == SPOTS
+
+
+@pytest.mark.parametrize("split", range(1, len(DOCUMENT)))
+def test_every_two_chunk_split(split):
+    chunks = [DOCUMENT[:split], DOCUMENT[split:]]
+    assert feed_all(ArrayItemParser("spots"), chunks) == SPOTS
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    parser = ArrayItemParser("spots")
+    first = json.dumps(SPOTS[0])
+    assert parser.feed('{"spots": [' + first[:-1]) == []
+    assert parser.feed(first[-1] + ", ") == [SPOTS[0]]
+
+
+def test_other_fields_are_ignored():
+    text = json.dumps({"other": [{"a": 1}], "spots": [{"b": 2}], "x": {"spots": [{"c": 3}]}})
+    assert feed_all(ArrayItemParser("spots"), text) == [{"b": 2}]
+
+
+def test_key_named_like_field_inside_a_string_value():
+    text = '{"note": "\\"spots\\": [", "spots": [{"a": 1}]}'
+    assert feed_all(ArrayItemParser("spots"), text) == [{"a": 1}]
+
+
+def test_validate():
+    schema = {
+        "type": "object",
+        "required": ["name"],
+        "properties": {
+            "name": {"type": "string"},
+            "rating": {"type": "number"},
+            "tags": {"type": "array", "items": {"type": "string"}},
+        },
+    }
+    assert validate({"name": "x", "rating": 4.5, "tags": ["a"]}, schema)
+    assert not validate({"rating": 4.5}, schema)
+    assert not validate({"name": "x", "rating": True}, schema)
+    assert not validate({"name": "x", "tags": ["a", 1]}, schema)